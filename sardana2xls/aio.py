@@ -0,0 +1,111 @@
+from sardana2xls.snapshot import Snapshot
+from sardana2xls.utils import get_pool_servers
+from sardana2xls.utils import listing_query, parse_listing
+from sardana2xls.utils import property_queries, parse_properties
+from sardana2xls.utils import attribute_queries, parse_attributes
+from sardana2xls.profiling import record
+from sardana2xls.policy import CallPolicy
+import asyncio
+
+# Default number of DbMySqlSelect running at the same time
+IN_FLIGHT_LIMIT = 8
+
+
+class AsyncDatabaseContext:
+    """ Tango database connection using the PyTango asyncio green mode """
+
+    def __init__(self, limit=IN_FLIGHT_LIMIT, proxy=None, policy=None):
+        self.limit = limit
+        # Timeout, retries, circuit breaker and adaptive limit
+        self.policy = policy if policy is not None else CallPolicy(limit=limit)
+        self.connections = 0
+        self.round_trips = 0
+        self.in_flight = 0
+        self._proxy = proxy
+        # Created in the running loop, on first use
+        self._proxy_lock = None
+        self._slots = None
+
+    async def proxy(self):
+        if self._proxy_lock is None:
+            self._proxy_lock = asyncio.Lock()
+        # Concurrent first selects share one connection
+        async with self._proxy_lock:
+            if self._proxy is None:
+                from tango.asyncio import DeviceProxy
+
+                proxy = await self.policy.call_async(
+                    DeviceProxy, "sys/database/2"
+                )
+                if self.policy.timeout:
+                    timeout = int(self.policy.timeout * 1000)
+                    proxy.set_timeout_millis(timeout)
+                self._proxy = proxy
+                self.connections += 1
+        return self._proxy
+
+    def _free_slot(self):
+        # Halved by the policy on failures, grown back on successes
+        return self.in_flight < min(self.limit, self.policy.limiter.limit)
+
+    async def _attempt(self, proxy, query):
+        # The slot is released during the backoff before a retry
+        async with self._slots:
+            await self._slots.wait_for(self._free_slot)
+            self.in_flight += 1
+        try:
+            return await proxy.command_inout("DbMySqlSelect", query)
+        finally:
+            async with self._slots:
+                self.in_flight -= 1
+                self._slots.notify_all()
+
+    async def select(self, query):
+        """ Run a DbMySqlSelect within the adaptive limit of the policy """
+        if self._slots is None:
+            self._slots = asyncio.Condition()
+        proxy = await self.proxy()
+        self.round_trips += 1
+        reply = record(
+            await self.policy.call_async(self._attempt, proxy, query)
+        )
+        return reply[1]
+
+    async def select_all(self, queries):
+        return await asyncio.gather(*[self.select(q) for q in queries])
+
+    # Bulk loaders, see DatabaseContext
+
+    async def get_server_listing(self, servers):
+        return parse_listing(await self.select(listing_query(servers)))
+
+    async def get_device_properties(self, devices):
+        replies = await self.select_all(property_queries(devices))
+        return parse_properties(replies)
+
+    async def get_attribute_values(self, devices):
+        replies = await self.select_all(attribute_queries(devices))
+        return parse_attributes(replies)
+
+
+async def load_snapshot(db, pool_names=None):
+    """ Fetch a Snapshot of the pools running the queries concurrently """
+    proxy = await db.proxy()
+    snapshot = Snapshot(proxy.get_db_host(), proxy.get_db_port())
+    servers = get_pool_servers(pool_names)
+    snapshot.listing = await db.get_server_listing(servers)
+    devices = snapshot.devices()
+    snapshot.properties, snapshot.attributes = await asyncio.gather(
+        db.get_device_properties(devices), db.get_attribute_values(devices)
+    )
+    return snapshot
+
+
+async def create_map(pool, db=None):
+    """ SardanaMap loaded with concurrent queries """
+    # Imported here, sardana2xls.sardana2xls uses this module for its CLI
+    from sardana2xls.sardana2xls import SardanaMap
+
+    if db is None:
+        db = AsyncDatabaseContext()
+    return SardanaMap(pool, await load_snapshot(db, [pool]))
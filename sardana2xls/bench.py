@@ -0,0 +1,243 @@
+from sardana2xls.sardana2xls import SardanaMap, write_rows
+from sardana2xls.snapshot import Snapshot
+from sardana2xls.writers import WRITERS
+import collections
+import tempfile
+import argparse
+import time
+import os
+
+# Number of axes of the synthetic controllers
+AXES = 32
+
+
+class LatencyDatabase:
+    """ Database stand-in adding a fixed latency to every call """
+
+    def __init__(self, db, latency):
+        self.db = db
+        self.latency = latency
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.calls += 1
+            time.sleep(self.latency)
+            return attr(*args, **kwargs)
+
+        return call
+
+
+def synthetic_snapshot(
+    pool, motors, pseudos=0, channels=0, measgrps=0, iors=0
+):
+    """ Snapshot of a generated pool, no tango db involved """
+    snapshot = Snapshot("bench", 10000)
+    pool_server = "Pool/{}".format(pool)
+    ms_server = "MacroServer/{}".format(pool)
+    ids = iter(range(1, 10 ** 9))
+
+    def add(server, name, cls, alias, **props):
+        snapshot.listing.add(server, name, cls, alias)
+        props.setdefault("id", [str(next(ids))])
+        for prop, values in props.items():
+            snapshot.properties.add(name, prop, values)
+        return props["id"][0]
+
+    def add_elements(kind, cls, count, roles=()):
+        """ Controllers of AXES elements each, return the element ids """
+        elem_ids = []
+        for n in range(count):
+            axis, ctrl = n % AXES + 1, n // AXES
+            if axis == 1:
+                ctrl_props = dict()
+                if roles:
+                    ctrl_props["motor_role_ids"] = [
+                        roles[(ctrl * 2 + i) % len(roles)] for i in range(2)
+                    ]
+                ctrl_name = "{}/controller/{}_{}".format(pool, kind, ctrl)
+                ctrl_id = add(
+                    pool_server,
+                    ctrl_name,
+                    "Controller",
+                    "{}_ctrl_{}".format(kind, ctrl),
+                    type=[cls],
+                    library=["{}Ctrl.py".format(kind)],
+                    klass=["{}Controller".format(kind)],
+                    host=["{}-{}".format(kind, ctrl)],
+                    port=["5000"],
+                    **ctrl_props
+                )
+            name = "{}/{}/{}".format(pool, kind, n)
+            elem_id = add(
+                pool_server,
+                name,
+                cls,
+                "{}_{}".format(kind, n),
+                axis=[str(axis)],
+                ctrl_id=[ctrl_id],
+            )
+            snapshot.attributes[name.lower()] = [
+                "Offset:{}".format(n),
+                "Sign:1",
+                "Step_per_unit:1000",
+            ]
+            elem_ids.append(elem_id)
+        return elem_ids
+
+    add(pool_server, "{}/pool/01".format(pool), "Pool", "Pool_" + pool)
+    add(ms_server, "{}/macroserver/01".format(pool), "MacroServer", "MS")
+    add(ms_server, "{}/door/01".format(pool), "Door", "Door_" + pool)
+    motor_ids = add_elements("motor", "Motor", motors)
+    add_elements("pseudo", "PseudoMotor", pseudos, motor_ids)
+    channel_ids = add_elements("channel", "CTExpChannel", channels)
+    add_elements("ior", "IORegister", iors)
+    for n in range(measgrps):
+        add(
+            pool_server,
+            "{}/mntgrp/{}".format(pool, n),
+            "MeasurementGroup",
+            "mg_{}".format(n),
+            elements=channel_ids[n : n + 4] or ["0"],
+        )
+    return snapshot
+
+
+def run(size, latency=0.0, fmt="xls", pool="bench"):
+    """ Time each export phase of a synthetic pool of size motors """
+    db = LatencyDatabase(
+        synthetic_snapshot(
+            pool,
+            size,
+            size // 2,
+            size // 2,
+            max(size // 50, 1),
+            size // 2,
+        ),
+        latency,
+    )
+    timings = collections.OrderedDict()
+
+    def timed(phase, func, *args):
+        start = time.time()
+        result = func(*args)
+        timings[phase] = time.time() - start
+        return result
+
+    smap = timed("init", SardanaMap, pool, db)
+    writer = WRITERS[fmt]("template/template.xls")
+    timed("motors", smap.proceed_motors, smap.motors, writer.motor_sheet)
+    timed("pseudos", smap.proceed_pseudos, smap.pseudos, writer.pseudo_sheet)
+    timed(
+        "controllers",
+        smap.proceed_controllers,
+        smap.controllers,
+        writer.controller_sheet,
+    )
+    timed("pool", smap.proceed_pool, smap.pool_name, writer.servers_sheet)
+    timed(
+        "macroserver",
+        smap.proceed_macroserver,
+        smap.ms_name,
+        writer.servers_sheet,
+    )
+    timed("global", smap.proceed_global, smap.pool, writer.global_sheet)
+    timed("iors", smap.proceed_iors, smap.iors, writer.ior_sheet)
+    timed(
+        "channels", smap.proceed_channel, smap.channels, writer.channel_sheet
+    )
+    timed("measgrps", smap.proceed_measgrps, smap.measgrps, writer.acq_sheet)
+    timed(
+        "instruments",
+        smap.proceed_instruments,
+        smap.instrument_list,
+        writer.instr_sheet,
+    )
+    timed("doors", smap.proceed_doors, smap.doors, writer.door_sheet)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "{}.{}".format(pool, fmt))
+        timed("save", writer.save, path)
+    timings["calls"] = db.calls
+    return timings
+
+
+def compare_writes(size, fmt="xls"):
+    """ Time writing size motor rows cell by cell and with the writer """
+    rows = [
+        (
+            "Motor",
+            "bench/pool/01",
+            "motor_ctrl_{}".format(n // AXES),
+            "motor_{}".format(n),
+            "bench/motor/{}".format(n),
+            str(n % AXES + 1),
+            "",
+            "",
+            "Offset:{};Sign:1;Step_per_unit:1000".format(n),
+        )
+        for n in range(size)
+    ]
+    timings = collections.OrderedDict()
+    paths = [
+        ("per cell", lambda writer: write_rows(writer.motor_sheet, rows)),
+        ("bulk", lambda writer: writer.write_rows(writer.motor_sheet, rows)),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        for phase, write in paths:
+            writer = WRITERS[fmt]("template/template.xls")
+            start = time.time()
+            write(writer)
+            timings[phase] = time.time() - start
+            writer.save(os.path.join(directory, "{}.{}".format(size, fmt)))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the export of synthetic pools"
+    )
+    parser.add_argument(
+        "sizes",
+        metavar="size",
+        type=int,
+        nargs="*",
+        default=[100, 1000, 10000],
+        help="Number of motors, with half as many pseudos and channels",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds added to every database call",
+    )
+    parser.add_argument("--format", choices=sorted(WRITERS), default="xls")
+    parser.add_argument(
+        "--writes",
+        action="store_true",
+        help="Compare the cell by cell and bulk sheet writes instead",
+    )
+    args = parser.parse_args()
+    if args.writes:
+        print("{:>12}{:>12}{:>12}".format("size", "per cell", "bulk"))
+        for size in args.sizes:
+            timings = compare_writes(min(size, 65535), args.format)
+            values = ["{:.3f}".format(v) for v in timings.values()]
+            print("".join("{:>12}".format(v) for v in [size] + values))
+        return
+    header = None
+    for size in args.sizes:
+        timings = run(size, args.latency, args.format)
+        if header is None:
+            header = ["size"] + list(timings)
+            print("".join("{:>12}".format(h) for h in header))
+        values = ["{:.3f}".format(v) for v in list(timings.values())[:-1]]
+        values = [size] + values + [timings["calls"]]
+        print("".join("{:>12}".format(v) for v in values))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+from sardana2xls.utils import DeviceProperties, get_history_stamps
+import threading
+import logging
+import sqlite3
+import json
+import os
+
+DEFAULT_CACHE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "sardana2xls",
+    "cache.sqlite",
+)
+
+
+class DatabaseCache:
+    """ Persistent cache of the bulk loaders, invalidated by db history """
+
+    def __init__(self, db, path=DEFAULT_CACHE):
+        self.db = db
+        self.hits = 0
+        self.misses = 0
+        self.host = "{}:{}".format(db.get_db_host(), db.get_db_port())
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "create table if not exists cache (host text, kind text, "
+            "device text, stamp text, data text, "
+            "primary key (host, kind, device))"
+        )
+
+    def _read(self, kind, devices, stamps):
+        """ Return the up to date cached data and the stale devices """
+        query = "select data, stamp from cache "
+        query += "where host=? and kind=? and device=?"
+        cached = dict()
+        stale = []
+        with self._lock:
+            for device in devices:
+                key = device.lower()
+                row = self._conn.execute(query, (self.host, kind, key))
+                row = row.fetchone()
+                if row is not None and row[1] == stamps.get(key, ""):
+                    cached[key] = json.loads(row[0])
+                else:
+                    stale.append(device)
+            self.hits += len(cached)
+            self.misses += len(stale)
+        return cached, stale
+
+    def _write(self, kind, data, stamps):
+        query = "insert or replace into cache values (?, ?, ?, ?, ?)"
+        rows = [
+            (self.host, kind, key, stamps.get(key, ""), json.dumps(value))
+            for key, value in data.items()
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(query, rows)
+
+    def _load(self, kind, devices, table, loader, empty):
+        stamps = get_history_stamps(devices, self.db, table)
+        cached, stale = self._read(kind, devices, stamps)
+        fresh = dict((device.lower(), empty) for device in stale)
+        if stale:
+            fresh.update(loader(stale))
+        self._write(kind, fresh, stamps)
+        logging.info(
+            "Cache {}: {} hit(s), {} miss(es)".format(
+                kind, len(cached), len(stale)
+            )
+        )
+        cached.update(fresh)
+        return cached
+
+    # Bulk loaders, see DatabaseContext
+
+    def get_server_listing(self, servers):
+        return self.db.get_server_listing(servers)
+
+    def get_device_properties(self, devices):
+        def loader(stale):
+            return self.db.get_device_properties(stale).items()
+
+        data = self._load(
+            "properties", devices, "property_device_hist", loader, {}
+        )
+        properties = DeviceProperties()
+        for device, props in data.items():
+            for prop, values in props.items():
+                properties.add(device, prop, values)
+        return properties
+
+    def get_attribute_values(self, devices):
+        data = self._load(
+            "attributes",
+            devices,
+            "property_attribute_device_hist",
+            self.db.get_attribute_values,
+            [],
+        )
+        return {k: v for k, v in data.items() if v}
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
@@ -0,0 +1,57 @@
+import collections
+
+# Element sheets compared between two exports: rows key, sheet, key column
+SHEETS = collections.OrderedDict(
+    [
+        ("motors", ("Motors", 4)),
+        ("pseudos", ("PseudoMotors", 4)),
+        ("controllers", ("Controllers", 2)),
+        ("iors", ("IORegisters", 4)),
+        ("channels", ("Channels", 4)),
+        ("measgrps", ("Acquisition", 3)),
+    ]
+)
+
+
+def read_workbook(path):
+    """ Rows of the element sheets of a workbook written by proceed """
+    import xlrd
+
+    book = xlrd.open_workbook(path)
+    rows = dict()
+    for key, (name, _) in SHEETS.items():
+        sheet = book.sheet_by_name(name)
+        rows[key] = [sheet.row_values(n) for n in range(1, sheet.nrows)]
+    return rows
+
+
+def fingerprint(row):
+    values = [str(value) for value in row]
+    while values and not values[-1]:
+        values.pop()
+    return tuple(values)
+
+
+def index_rows(rows, column):
+    index = dict()
+    for row in rows:
+        row = fingerprint(row)
+        if len(row) > column:
+            index[row[column]] = row
+    return index
+
+
+def diff_rows(previous, current):
+    """ Added, removed and changed elements of each sheet """
+    diff = collections.OrderedDict()
+    for key, (_, column) in SHEETS.items():
+        old = index_rows(previous.get(key, []), column)
+        new = index_rows(current.get(key, []), column)
+        changes = {
+            "added": sorted(set(new) - set(old)),
+            "removed": sorted(set(old) - set(new)),
+            "changed": sorted(k for k in new if k in old and new[k] != old[k]),
+        }
+        if any(changes.values()):
+            diff[key] = changes
+    return diff
@@ -0,0 +1,117 @@
+import collections
+
+
+class Element:
+    """ One sardana element, references are kept as sardana ids """
+
+    __slots__ = (
+        "name",
+        "cls",
+        "alias",
+        "id",
+        "ctrl_id",
+        "instrument_id",
+        "refs",
+    )
+
+    def __init__(self, name, cls, alias="", id=None, ctrl_id=None):
+        self.name = name
+        self.cls = cls
+        self.alias = alias
+        self.id = id
+        self.ctrl_id = ctrl_id
+        self.instrument_id = None
+        # Motor roles of a pseudo controller, channels of a measurement group
+        self.refs = ()
+
+    def __repr__(self):
+        return "Element({!r}, {!r})".format(self.name, self.cls)
+
+
+def first(props, name, prop):
+    """ First value of a property, None if not defined """
+    values = props.get_device_property(name, prop)[prop]
+    return values[0] if values else None
+
+
+class ElementRegistry:
+    """ Sardana elements indexed by name, id, alias, class and controller """
+
+    def __init__(self):
+        self.elements = []
+        self.by_name = dict()
+        self.by_id = dict()
+        self.by_alias = dict()
+        self.by_class = collections.OrderedDict()
+        self.by_controller = dict()
+
+    @classmethod
+    def load(cls, names, listing, props=None):
+        """ Build the elements from the bulk loaded listing and properties """
+        registry = cls()
+        for name in names:
+            try:
+                alias = listing.get_alias(name)
+            except KeyError:
+                alias = ""
+            element = Element(name, listing.get_class_for_device(name), alias)
+            if props is not None:
+                element.id = first(props, name, "id")
+                element.ctrl_id = first(props, name, "ctrl_id")
+                element.instrument_id = first(props, name, "instrument_id")
+                for prop in ("motor_role_ids", "elements"):
+                    refs = props.get_device_property(name, prop)[prop]
+                    if refs:
+                        element.refs = tuple(refs)
+                        break
+            registry.add(element)
+        return registry
+
+    def add(self, element):
+        self.elements.append(element)
+        self.by_name[element.name.lower()] = element
+        if element.id is not None:
+            self.by_id[element.id] = element
+        if element.alias:
+            self.by_alias[element.alias.lower()] = element
+        self.by_class.setdefault(element.cls.lower(), []).append(element)
+        if element.ctrl_id is not None:
+            self.by_controller.setdefault(element.ctrl_id, []).append(element)
+
+    def __getitem__(self, name):
+        return self.by_name[name.lower()]
+
+    def __contains__(self, name):
+        return name.lower() in self.by_name
+
+    def __iter__(self):
+        return iter(self.elements)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def names(self, cls):
+        """ Names of the elements of a class, in loading order """
+        return [element.name for element in self.by_class.get(cls.lower(), [])]
+
+    def alias(self, name):
+        """ Alias of an element, KeyError if it has none """
+        alias = self[name].alias
+        if not alias:
+            raise KeyError(name)
+        return alias
+
+    def alias_of_id(self, id):
+        """ Alias of the element with a sardana id, KeyError if none """
+        alias = self.by_id[id].alias
+        if not alias:
+            raise KeyError(id)
+        return alias
+
+    def controller(self, name):
+        """ Controller element of an element """
+        return self.by_id[self[name].ctrl_id]
+
+    def elements_of(self, ctrl):
+        """ Elements driven by a controller """
+        return self.by_controller.get(self[ctrl].id, [])
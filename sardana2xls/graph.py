@@ -0,0 +1,157 @@
+from sardana2xls.elements import ElementRegistry
+from sardana2xls.utils import DatabaseContext, get_pool_servers
+from sardana2xls.utils import get_elements
+import collections
+import argparse
+
+
+class DependencyGraph:
+    """ Elements of one or many pools and the elements they use """
+
+    def __init__(self):
+        # Edges go from an element to its controller, to the motor roles of
+        # a pseudo controller or to the channels of a measurement group.
+        # Nodes are element names, sardana ids are only unique in a pool.
+        self.elements = dict()
+        # Element names by lowercase alias, None if used in several pools
+        self.aliases = dict()
+        self.refs = dict()
+        self.uses = dict()
+        self.used_by = dict()
+        # Ids referenced by an element but not defined in its pool
+        self.missing = dict()
+
+    @classmethod
+    def build(cls, registries):
+        graph = cls()
+        for registry in registries:
+            graph.add_pool(registry)
+        return graph
+
+    def add_pool(self, registry):
+        """ Add the elements of one pool, references resolved in the pool """
+        for element in registry:
+            key = element.name.lower()
+            self.elements[key] = element
+            if element.alias:
+                alias = element.alias.lower()
+                self.aliases[alias] = None if alias in self.aliases else key
+            self.refs[key] = []
+            self.uses.setdefault(key, [])
+            self.used_by.setdefault(key, [])
+        for element in registry:
+            key = element.name.lower()
+            if element.ctrl_id in registry.by_id:
+                self._link(key, registry.by_id[element.ctrl_id])
+            for ref in element.refs:
+                if ref not in registry.by_id:
+                    self.missing.setdefault(key, []).append(ref)
+                    continue
+                self.refs[key].append(registry.by_id[ref])
+                self._link(key, registry.by_id[ref])
+
+    def _link(self, key, target):
+        self.uses[key].append(target)
+        self.used_by[target.name.lower()].append(self.elements[key])
+
+    def __contains__(self, name):
+        return name.lower() in self.elements
+
+    def key(self, name):
+        """ Node of an element name or alias, KeyError if unknown """
+        key = name.lower()
+        if key in self.elements:
+            return key
+        if self.aliases.get(key) is None:
+            raise KeyError("Unknown or ambiguous element: {}".format(name))
+        return self.aliases[key]
+
+    def __len__(self):
+        return len(self.elements)
+
+    def references(self, name):
+        """ Motor roles or channels of an element, in property order """
+        return self.refs[self.key(name)]
+
+    def dependencies(self, name):
+        """ Elements directly used by an element """
+        return self.uses[self.key(name)]
+
+    def dependents(self, name, recursive=False, cls=None):
+        """ Elements using an element, directly or through other elements """
+        found = collections.OrderedDict()
+        queue = collections.deque([self.key(name)])
+        while queue:
+            for element in self.used_by[queue.popleft()]:
+                key = element.name.lower()
+                if key in found:
+                    continue
+                found[key] = element
+                if recursive:
+                    queue.append(key)
+        return [
+            element
+            for element in found.values()
+            if cls is None or element.cls.lower() == cls.lower()
+        ]
+
+    def to_dot(self):
+        """ Graphviz representation, elements labelled with their alias """
+        lines = ["digraph sardana {"]
+        for key, element in self.elements.items():
+            label = element.alias or element.name
+            lines.append('    "{}" [label="{}"];'.format(key, label))
+        for key, targets in self.uses.items():
+            for target in targets:
+                lines.append(
+                    '    "{}" -> "{}";'.format(target.name.lower(), key)
+                )
+        lines.append("}")
+        return "\n".join(lines)
+
+
+def load_graph(pool_names=None, db=None):
+    """ Dependency graph of the pools (all of them by default), in bulk """
+    if db is None:
+        db = DatabaseContext()
+    listing = db.get_server_listing(get_pool_servers(pool_names))
+    if not pool_names:
+        servers = listing.get_server_list("Pool/*")
+        pool_names = [server.split("/", 1)[1] for server in servers]
+    elements = {name: get_elements(name, listing) for name in pool_names}
+    props = db.get_device_properties(
+        [e for names in elements.values() for e in names]
+    )
+    return DependencyGraph.build(
+        ElementRegistry.load(names, listing, props)
+        for names in elements.values()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sardana element dependencies of the pools"
+    )
+    parser.add_argument(
+        "poolname", metavar="pool", nargs="*", help="Pool instance name"
+    )
+    parser.add_argument(
+        "--dependents",
+        metavar="NAME",
+        help="Print the elements depending on an element instead",
+    )
+    args = parser.parse_args()
+    graph = load_graph(args.poolname)
+    if args.dependents:
+        try:
+            dependents = graph.dependents(args.dependents, recursive=True)
+        except KeyError as exc:
+            parser.error(exc.args[0])
+        for element in dependents:
+            print("{} {} {}".format(element.cls, element.alias, element.name))
+    else:
+        print(graph.to_dot())
+
+
+if __name__ == "__main__":
+    main()
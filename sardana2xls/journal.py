@@ -0,0 +1,111 @@
+import collections
+import threading
+import logging
+import json
+import os
+
+
+class RecordingSheet:
+    """ Sheet keeping the cells written, to replay them on a real sheet """
+
+    def __init__(self):
+        self.cells = []
+
+    def write(self, line, index, value):
+        self.cells.append([line, index, value])
+
+
+class Journal:
+    """ Rows of the finished phases of an export, one json line per row """
+
+    def __init__(self, path, key):
+        self.path = path
+        # Export parameters, a journal of another export is not resumed
+        self.key = key
+        # Rows of the phases finished by an interrupted export
+        self.phases = collections.OrderedDict()
+        self._fp = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path, key, resume=False, force=False):
+        journal = cls(path, key)
+        if os.path.exists(path):
+            if resume:
+                journal._read()
+            elif not force:
+                raise FileExistsError(
+                    "{} holds an interrupted export, resume it or force "
+                    "a new one".format(path)
+                )
+        # Rewritten without the unfinished phases, if any
+        journal._fp = open(path, "w")
+        journal._append(key)
+        for name, rows in journal.phases.items():
+            for row in rows:
+                journal._append([name, row])
+            journal._finish(name)
+        return journal
+
+    def _read(self):
+        # A phase is a [name, row] line per row then a [name] end marker
+        started = dict()
+        with open(self.path) as fp:
+            lines = iter(fp)
+            try:
+                key = json.loads(next(lines, "null"))
+                if key != self.key:
+                    logging.warning(
+                        "{} is from another export, ignored".format(self.path)
+                    )
+                    return
+                for line in lines:
+                    entry = json.loads(line)
+                    rows = started.setdefault(entry[0], [])
+                    if len(entry) == 2:
+                        rows.append(entry[1])
+                    else:
+                        self.phases[entry[0]] = started.pop(entry[0])
+            except ValueError:
+                # Line cut by a crash
+                pass
+        logging.info(
+            "Resuming {} phase(s) from {}".format(len(self.phases), self.path)
+        )
+
+    def _append(self, entry):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._fp.write(line)
+
+    def _finish(self, name):
+        self._append([name])
+        with self._lock:
+            self._fp.flush()
+            os.fsync(self._fp.fileno())
+
+    def __contains__(self, name):
+        return name in self.phases
+
+    def __getitem__(self, name):
+        return self.phases[name]
+
+    def record(self, name, rows):
+        """ Yield the rows, each journaled, the phase finished with them """
+        for row in rows:
+            self._append([name, row])
+            yield row
+        self._finish(name)
+
+    def close(self, done=True):
+        """ Close the file, removed once the export is saved """
+        self._fp.close()
+        if done:
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Kept to resume from when the export failed
+        self.close(exc_type is None)
@@ -0,0 +1,42 @@
+import tempfile
+import pickle
+import heapq
+
+# Number of rows sorted in memory before spilling to a temporary file
+BUFFER_SIZE = 10000
+
+
+def _spill(rows):
+    run = tempfile.TemporaryFile()
+    for row in rows:
+        pickle.dump(row, run, pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+
+def _read(run):
+    with run:
+        while True:
+            try:
+                yield pickle.load(run)
+            except EOFError:
+                return
+
+
+def sort_rows(rows, key, buffer_size=BUFFER_SIZE):
+    """ Stable sort of a row iterable keeping at most buffer_size in memory """
+    # A generator, rows are only built once the first sorted one is read
+    runs = []
+    buffer = []
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) >= buffer_size:
+            buffer.sort(key=key)
+            runs.append(_spill(buffer))
+            buffer = []
+    buffer.sort(key=key)
+    if not runs:
+        yield from buffer
+        return
+    # Ties are taken from the first runs first, which keeps the sort stable
+    yield from heapq.merge(*([_read(run) for run in runs] + [buffer]), key=key)
@@ -0,0 +1,175 @@
+import threading
+import logging
+import time
+
+# DevFailed reasons of a busy or unreachable db, worth another try
+TRANSIENT_REASONS = {
+    "API_DeviceTimedOut",
+    "API_CommunicationFailed",
+    "API_CorbaException",
+    "API_CantConnectToDatabase",
+    "API_CantConnectToDevice",
+}
+
+# Default number of db calls running at the same time
+CALL_LIMIT = 8
+
+
+def is_transient(exc):
+    """ Whether a failed db call may succeed if sent again """
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    # DevFailed arguments are the DevError stack, no tango import needed
+    reasons = (getattr(error, "reason", None) for error in exc.args)
+    return any(reason in TRANSIENT_REASONS for reason in reasons)
+
+
+class CircuitOpen(Exception):
+    """ The db failed too many times in a row, calls are not sent """
+
+
+class AdaptiveLimit:
+    """ Concurrent calls limit, halved on overload and grown back by one """
+
+    def __init__(self, limit=CALL_LIMIT):
+        self.max = limit
+        self.limit = limit
+        self.active = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def __exit__(self, *exc_info):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def success(self):
+        with self._cond:
+            self._successes += 1
+            if self.limit < self.max and self._successes >= self.limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def overload(self):
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+
+
+class CallPolicy:
+    """ Timeout, retries with backoff and circuit breaker of the db calls """
+
+    def __init__(
+        self,
+        timeout=None,
+        retries=3,
+        backoff=0.5,
+        max_backoff=10.0,
+        limit=CALL_LIMIT,
+        threshold=5,
+        cooldown=30.0,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        # Seconds, applied by the client to every call
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter = AdaptiveLimit(limit)
+        # Consecutive transient failures opening the circuit
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.sleep = sleep
+        self.failures = 0
+        self.retried = 0
+        self.opened = None
+        self._lock = threading.Lock()
+
+    def delay(self, attempt):
+        return min(self.max_backoff, self.backoff * 2 ** attempt)
+
+    def call(self, func, *args, **kwargs):
+        """ Call func, sent again on transient errors until retries run out """
+        attempt = 0
+        while True:
+            self._check_circuit()
+            try:
+                with self.limiter:
+                    result = func(*args, **kwargs)
+            except Exception as exc:
+                if not is_transient(exc):
+                    raise
+                self._failure()
+                if attempt >= self.retries:
+                    raise
+                self.sleep(self._retry(exc, attempt))
+                attempt += 1
+            else:
+                self._success()
+                return result
+
+    async def call_async(self, func, *args, **kwargs):
+        """ call() awaiting func, the caller keeps within limiter.limit """
+        import asyncio
+
+        attempt = 0
+        while True:
+            self._check_circuit()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as exc:
+                if not is_transient(exc):
+                    raise
+                self._failure()
+                if attempt >= self.retries:
+                    raise
+                await asyncio.sleep(self._retry(exc, attempt))
+                attempt += 1
+            else:
+                self._success()
+                return result
+
+    def _retry(self, exc, attempt):
+        """ Count a retry, return the delay before it """
+        delay = self.delay(attempt)
+        logging.warning(
+            "Db call failed ({}), retry in {:.1f} s".format(
+                type(exc).__name__, delay
+            )
+        )
+        with self._lock:
+            self.retried += 1
+        return delay
+
+    def _check_circuit(self):
+        with self._lock:
+            if self.opened is None:
+                return
+            if self.clock() - self.opened < self.cooldown:
+                raise CircuitOpen(
+                    "{} db calls failed in a row".format(self.failures)
+                )
+            # Half open: one more failure opens the circuit again
+            self.opened = None
+            self.failures = self.threshold - 1
+
+    def _success(self):
+        with self._lock:
+            self.failures = 0
+        self.limiter.success()
+
+    def _failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened = self.clock()
+        self.limiter.overload()
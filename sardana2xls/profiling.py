@@ -0,0 +1,99 @@
+import collections
+import contextlib
+import threading
+import json
+import time
+
+# Profiler recording the phases, None when profiling is disabled
+_profiler = None
+
+
+class Profiler:
+    """ Wall time, db calls and bytes returned of each export phase """
+
+    def __init__(self):
+        self.phases = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stats(self, name):
+        return self.phases.setdefault(
+            name, {"time": 0.0, "calls": 0, "bytes": 0}
+        )
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(name)
+        start = time.time()
+        try:
+            yield
+        finally:
+            stack.pop()
+            with self._lock:
+                self._stats(name)["time"] += time.time() - start
+
+    def record(self, calls, size):
+        """ Account db calls to the current phase of the thread """
+        stack = self._local.__dict__.get("stack") or ["other"]
+        with self._lock:
+            stats = self._stats(stack[-1])
+            stats["calls"] += calls
+            stats["bytes"] += size
+
+    def table(self):
+        lines = [
+            "{:<20}{:>12}{:>10}{:>12}".format(
+                "phase", "time (s)", "calls", "bytes"
+            )
+        ]
+        for name, stats in self.phases.items():
+            lines.append(
+                "{:<20}{:>12.3f}{:>10}{:>12}".format(
+                    name, stats["time"], stats["calls"], stats["bytes"]
+                )
+            )
+        return "\n".join(lines)
+
+    def json(self):
+        return json.dumps(self.phases, indent=4)
+
+
+def enable():
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def disable():
+    global _profiler
+    _profiler = None
+
+
+@contextlib.contextmanager
+def phase(name):
+    if _profiler is None:
+        yield
+    else:
+        with _profiler.phase(name):
+            yield
+
+
+def record(reply):
+    """ Account one db call returning reply """
+    if _profiler is not None:
+        _profiler.record(1, reply_size(reply))
+    return reply
+
+
+def reply_size(reply):
+    """ Approximate size in bytes of a db reply """
+    if isinstance(reply, (str, bytes)):
+        return len(reply)
+    if isinstance(reply, dict):
+        return sum(reply_size(k) + reply_size(v) for k, v in reply.items())
+    if isinstance(reply, (list, tuple)):
+        return sum(reply_size(value) for value in reply)
+    if hasattr(reply, "nbytes"):
+        return reply.nbytes
+    return 8
@@ -1,107 +1,342 @@
 from sardana2xls.utils import get_elements, get_ms_elements
 from sardana2xls.utils import generate_aliases_mapping
+from sardana2xls.utils import generate_class_mapping
 from sardana2xls.utils import generate_id_mapping
 from sardana2xls.utils import generate_prop_mapping
-from sardana2xls.utils import generate_class_mapping
 from sardana2xls.utils import generate_instrument_list
 from sardana2xls.utils import generate_instrument_mapping
-import tango
-import xlrd
-from xlutils.copy import copy
-from functools import partial
+from sardana2xls.utils import get_attribute_values
+from sardana2xls.utils import get_pool_servers
+from sardana2xls.utils import DatabaseContext
+from sardana2xls.policy import CallPolicy
+from sardana2xls.snapshot import Snapshot
+from sardana2xls.elements import ElementRegistry
+from sardana2xls.graph import DependencyGraph
+from sardana2xls.cache import DatabaseCache, DEFAULT_CACHE
+from sardana2xls.delta import read_workbook, diff_rows
+from sardana2xls.writers import XlsWriter, WRITERS  # noqa: F401
+from sardana2xls.pipeline import sort_rows
+from sardana2xls.journal import Journal, RecordingSheet
+from sardana2xls import profiling
+from sardana2xls.profiling import phase
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
 import argparse
+import json
 import logging
+import threading
+
+# Sheets which can be exported alone
+SHEET_NAMES = [
+    "motors",
+    "pseudos",
+    "controllers",
+    "iors",
+    "channels",
+    "measgrps",
+    "servers",
+    "doors",
+    "instruments",
+]
+
+# Sheets of the elements referenced by the rows of a sheet
+SHEET_REFERENCES = {
+    "motors": ["controllers"],
+    "pseudos": ["controllers"],
+    "iors": ["controllers"],
+    "channels": ["controllers"],
+    "controllers": ["motors", "pseudos"],
+    "measgrps": ["channels"],
+}
+
+# Sheets exporting the memorized attribute values
+ATTRIBUTE_SHEETS = ["motors", "pseudos", "iors", "channels"]
+
+
+def sheet_of(cls):
+    """ Element sheet listing a tango class, None if there is none """
+    cls = cls.lower()
+    if "counter" in cls or "channel" in cls:
+        return "channels"
+    return {
+        "controller": "controllers",
+        "motor": "motors",
+        "pseudomotor": "pseudos",
+        "ioregister": "iors",
+        "measurementgroup": "measgrps",
+    }.get(cls)
+
+
+class memoized:
+    """ Property computed once, on first use """
+
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        with obj._lock:
+            if self.name not in obj.__dict__:
+                obj.__dict__[self.name] = self.func(obj)
+        return obj.__dict__[self.name]
+
+
+def selected(sheets, name):
+    return sheets is None or name in sheets
 
 
 class SardanaMap:
     """ Manage sardana elements """
 
-    def __init__(self, pool):
-        # Connect to the tangodb
-        self.db = tango.Database()
-        # Collect tango device running in the Pool
+    def __init__(
+        self,
+        pool,
+        db=None,
+        listing=None,
+        sheets=None,
+        classes=None,
+        lazy=False,
+    ):
+        # Connect to the tangodb, the connection is shared by every helper
+        self.db = db if db is not None else DatabaseContext()
         self.pool = pool
+        # Only load what the sheets and classes exported need, all by default
+        self.sheets = sheets
+        self.class_filter = [c.lower() for c in classes] if classes else None
+        # Guard the bulk loads, sheets can be built by several threads
+        self._lock = threading.RLock()
         self.pool_server = "Pool/{}".format(self.pool)
-        self.pool_name = self.db.get_device_name(self.pool_server, "Pool")[0]
+        self.ms_server = "MacroServer/{}".format(pool)
+        # Devices and classes of the servers, can be shared between pools
+        if listing is None:
+            servers = (self.pool_server, self.ms_server)
+            with phase("listing"):
+                listing = self.db.get_server_listing(servers)
+        self.listing = listing
+        # Collect tango device running in the Pool
+        self.pool_name = listing.get_device_name(self.pool_server, "Pool")[0]
         logging.info("Pool: {}".format(pool))
         logging.info("Server: {}".format(self.pool_server))
         logging.info("Pool device: {}".format(self.pool_name))
         # Collect tango device running in the MS
-        self.ms_server = "MacroServer/{}".format(pool)
-        self.ms_name = self.db.get_device_name(self.ms_server, "MacroServer")[
+        self.ms_name = listing.get_device_name(self.ms_server, "MacroServer")[
             0
         ]
         logging.info("MacroServer: {}".format(self.ms_server))
         logging.info("MacroServer device: {}".format(self.ms_name))
-        self._setup_mapping()
-        self._setup_class_mapping()
+        if not lazy:
+            self._setup_mapping()
+            self._setup_class_mapping()
 
     def _setup_mapping(self):
         """ Generate internal sardana id mapping """
-        db = self.db
-        # Prepare environment
-        elements = get_elements(self.pool, self.db)
-        self.elements = elements
-        self.ms_elements = get_ms_elements(self.pool, self.db)
-        # Generate mapping
-        self.aliases = generate_aliases_mapping(elements, db)
-        self.ids = generate_id_mapping(elements, db)
-        self.ctrl_ids = generate_prop_mapping(elements, db, "ctrl_id")
-        self.motor_ids = generate_prop_mapping(elements, db, "motor_role_ids")
-        self.pseudo_ids = generate_prop_mapping(
-            elements, db, "pseudo_motor_role_ids"
-        )
-        self.channel_ids = generate_prop_mapping(elements, db, "elements")
-        self.instrument_list = generate_instrument_list(self.pool_name, db)
-        self.instrument_ids = generate_instrument_mapping(self.instrument_list)
+        self.properties
+        self.attributes
+        self.registry
+        self.graph
+        self.ms_registry
+        self.instrument_ids
 
     def _setup_class_mapping(self):
         """ Sort sardana elements  """
-        elements = self.elements
-        ms_elements = self.ms_elements
-        db = self.db
-        # Class mapping
-        classes = generate_class_mapping(elements, db)
-        self.classes = classes
-        classes_ms = generate_class_mapping(ms_elements, db)
-        self.classes_ms = classes_ms
-        self.controllers = [
-            k for k, v in classes.items() if v.lower() == "controller"
-        ]
-        self.motors = [k for k, v in classes.items() if v == "Motor"]
-        self.pseudos = [k for k, v in classes.items() if v == "PseudoMotor"]
-        self.iors = [k for k, v in classes.items() if v == "IORegister"]
-        self.measgrps = [
-            k for k, v in classes.items() if v == "MeasurementGroup"
+        for name in (
+            "controllers",
+            "motors",
+            "pseudos",
+            "iors",
+            "channels",
+            "measgrps",
+            "macroservers",
+            "doors",
+        ):
+            getattr(self, name)
+
+    # Bulk loaded on first use
+
+    @memoized
+    def elements(self):
+        elements = get_elements(self.pool, self.listing)
+        if self.sheets is None:
+            return elements
+        needed = set(self.sheets)
+        for sheet in self.sheets:
+            needed.update(SHEET_REFERENCES.get(sheet, []))
+        # The pool itself holds the instrument list
+        return [
+            name
+            for name in elements
+            if name == self.pool_name
+            or sheet_of(self.listing.get_class_for_device(name)) in needed
         ]
-        self.macroservers = [
-            k for k, v in classes_ms.items() if v == "MacroServer"
+
+    @memoized
+    def ms_elements(self):
+        return get_ms_elements(self.pool, self.listing)
+
+    @memoized
+    def properties(self):
+        """ Every property of the elements, loaded at once """
+        with phase("properties"):
+            return self.db.get_device_properties(self.elements)
+
+    @memoized
+    def attributes(self):
+        """ Memorized attribute values of the exported elements """
+        sheets = [s for s in ATTRIBUTE_SHEETS if selected(self.sheets, s)]
+        names = [
+            name
+            for name in self.elements
+            if sheet_of(self.listing.get_class_for_device(name)) in sheets
+            and self.wanted(name)
         ]
-        self.doors = [k for k, v in classes_ms.items() if v == "Door"]
-        self.channels = [
-            (k, v)
-            for k, v in classes.items()
-            if "counter" in v.lower() or "channel" in v.lower()
+        with phase("attributes"):
+            return self.db.get_attribute_values(names)
+
+    @memoized
+    def registry(self):
+        properties = self.properties
+        with phase("elements"):
+            return ElementRegistry.load(
+                self.elements, self.listing, properties
+            )
+
+    @memoized
+    def graph(self):
+        """ Dependencies between the elements of the pool """
+        return DependencyGraph.build([self.registry])
+
+    @memoized
+    def ms_registry(self):
+        return ElementRegistry.load(self.ms_elements, self.listing)
+
+    @memoized
+    def instrument_list(self):
+        properties = self.properties
+        with phase("instruments"):
+            return generate_instrument_list(self.pool_name, properties)
+
+    @memoized
+    def instrument_ids(self):
+        return generate_instrument_mapping(self.instrument_list)
+
+    def names(self, cls):
+        """ Exported elements of a class """
+        return [n for n in self.registry.names(cls) if self.wanted(n)]
+
+    @memoized
+    def controllers(self):
+        return self.names("Controller")
+
+    @memoized
+    def motors(self):
+        return self.names("Motor")
+
+    @memoized
+    def pseudos(self):
+        return self.names("PseudoMotor")
+
+    @memoized
+    def iors(self):
+        return self.names("IORegister")
+
+    @memoized
+    def measgrps(self):
+        return self.names("MeasurementGroup")
+
+    @memoized
+    def channels(self):
+        return [
+            (e.name, e.cls)
+            for e in self.registry
+            if sheet_of(e.cls) == "channels" and self.wanted(e.name)
         ]
 
+    @memoized
+    def macroservers(self):
+        return self.ms_registry.names("MacroServer")
+
+    @memoized
+    def doors(self):
+        return self.ms_registry.names("Door")
+
+    # Mappings of the previous releases, for library users
+
+    @memoized
+    def classes(self):
+        return generate_class_mapping(self.elements, self.listing)
+
+    @memoized
+    def classes_ms(self):
+        return generate_class_mapping(self.ms_elements, self.listing)
+
+    @memoized
+    def aliases(self):
+        return generate_aliases_mapping(self.elements, self.listing)
+
+    @memoized
+    def ids(self):
+        return generate_id_mapping(self.elements, self.properties)
+
+    @memoized
+    def ctrl_ids(self):
+        return generate_prop_mapping(self.elements, self.properties, "ctrl_id")
+
+    @memoized
+    def motor_ids(self):
+        return generate_prop_mapping(
+            self.elements, self.properties, "motor_role_ids"
+        )
+
+    @memoized
+    def pseudo_ids(self):
+        return generate_prop_mapping(
+            self.elements, self.properties, "pseudo_motor_role_ids"
+        )
+
+    @memoized
+    def channel_ids(self):
+        return generate_prop_mapping(
+            self.elements, self.properties, "elements"
+        )
+
+    def wanted(self, name):
+        """ Whether the class of an element is exported """
+        return self.class_filter is None or (
+            self.registry[name].cls.lower() in self.class_filter
+        )
+
+    def get_controller_alias(self, name):
+        """ Alias of the controller of one element """
+        return self.registry.alias_of_id(self.registry[name].ctrl_id)
+
+    def get_instrument(self, name):
+        """ Instrument of one element, empty if it has none """
+        try:
+            return self.instrument_ids[self.registry[name].instrument_id]
+        except KeyError:
+            return ""
+
+    def get_attributes(self, name):
+        """ Memorized attribute values of one element """
+        return self.attributes.get(name.lower(), [])
+
     def ior_data(self, name):
         """ Format one IORegister """
-        ior_ctrl = self.aliases[self.ids[self.ctrl_ids[name][0]]]
+        ior_ctrl = self.get_controller_alias(name)
         ior_type = "IORegister"
         ior_pool = self.pool_name
-        ior_alias = self.aliases[name]
+        ior_alias = self.registry.alias(name)
         ior_name = name
-        ior_axis = get_property(name, "Axis")
-        try:
-            ior_instr = get_property(name, "instrument_id")
-            ior_instrument = self.instrument_ids[ior_instr]
-        # TODO: Which exception ?
-        except Exception:
-            ior_instrument = ""
+        ior_axis = get_property(name, "Axis", self.properties)
+        ior_instrument = self.get_instrument(name)
         ior_desc = ""
-        ior_attributes = ";".join(get_motor_attributes(name))
+        ior_attributes = ";".join(self.get_attributes(name))
         return (
             ior_type,
             ior_pool,
@@ -116,20 +351,15 @@ class SardanaMap:
 
     def channel_data(self, name, _type):
         """ Format one Acquisition channel """
-        channel_ctrl = self.aliases[self.ids[self.ctrl_ids[name][0]]]
+        channel_ctrl = self.get_controller_alias(name)
         channel_type = _type
         channel_pool = self.pool_name
-        channel_alias = self.aliases[name]
+        channel_alias = self.registry.alias(name)
         channel_name = name
-        channel_axis = get_property(name, "Axis")
-        try:
-            channel_instr = get_property(name, "instrument_id")
-            channel_instrument = self.instrument_ids[channel_instr]
-        # TODO: Which exception ?
-        except Exception:
-            channel_instrument = ""
+        channel_axis = get_property(name, "Axis", self.properties)
+        channel_instrument = self.get_instrument(name)
         channel_desc = ""
-        channel_attributes = ";".join(get_motor_attributes(name))
+        channel_attributes = ";".join(self.get_attributes(name))
         return (
             channel_type,
             channel_pool,
@@ -147,21 +377,13 @@ class SardanaMap:
         mot_type = mot_type
         mot_pool = self.pool_name
 
-        mot_ctrl = self.aliases[self.ids[self.ctrl_ids[name][0]]]
-        try:
-            mot_alias = self.aliases[name]
-        except KeyError:
-            mot_alias = ""
+        mot_ctrl = self.get_controller_alias(name)
+        mot_alias = self.registry[name].alias
         mot_device = name
-        mot_axis = get_property(name, "Axis")
-        try:
-            mot_instr = get_property(name, "instrument_id")
-            mot_instrument = self.instrument_ids[mot_instr]
-        # TODO: Which exception
-        except Exception:
-            mot_instrument = ""
+        mot_axis = get_property(name, "Axis", self.properties)
+        mot_instrument = self.get_instrument(name)
         mot_desc = ""
-        mot_attributes = ";".join(get_motor_attributes(name))
+        mot_attributes = ";".join(self.get_attributes(name))
         return (
             mot_type,
             mot_pool,
@@ -174,28 +396,38 @@ class SardanaMap:
             mot_attributes,
         )
 
-    def get_controller_elements(self, name, ctrl_type):
+    def get_references(self, name):
+        """ Aliases of the motor roles or channels of an element """
         elems = []
-        if ctrl_type == "PseudoMotor":
-            for motor in self.motor_ids[name]:
-                try:
-                    elems.append(self.aliases[self.ids[motor]])
-                except KeyError as e:
-                    print(e)
+        for element in self.graph.references(name):
+            if element.alias:
+                elems.append(element.alias)
+            else:
+                logging.warning("{} has no alias".format(element.name))
+        for ref in self.graph.missing.get(name.lower(), []):
+            logging.warning("{} uses unknown element {}".format(name, ref))
         return ";".join(elems)
 
-    def controller_data(self, name):
-        ctrl_prop = partial(get_property, name)
-        ctrl_type = ctrl_prop("type")
-        ctrl_lib = ctrl_prop("library")
-        ctrl_class = ctrl_prop("klass")
-        ctrl_props = ";".join(get_properties(name))
+    def get_controller_elements(self, name, ctrl_type):
+        if ctrl_type == "PseudoMotor":
+            return self.get_references(name)
+        return ""
+
+    def controller_data(self, name, db=None):
+        """ Format one controller, its properties read in one call """
+        db = self.db if db is None else db
+        props = get_property_list(name, db)
+        values = db.get_device_property(name, controller_properties + props)
+        ctrl_type, ctrl_lib, ctrl_class = [
+            join_property(values[p]) for p in controller_properties
+        ]
+        ctrl_props = ";".join(format_properties(props, values))
         ctrl_elements = self.get_controller_elements(name, ctrl_type)
         # ctrl_device = name
         return [
             ctrl_type,
             self.pool_name,
-            self.aliases[name],
+            self.registry.alias(name),
             # ctrl_device,
             ctrl_lib,
             ctrl_class,
@@ -207,51 +439,52 @@ class SardanaMap:
         mg_type = "MeasurementGroup"
         mg_pool = self.pool_name
         mg_device = name
-        mg_alias = self.aliases[name]
+        mg_alias = self.registry.alias(name)
         mg_desc = ""
         mg_channels = self.get_mg_channels(name)
 
         return (mg_type, mg_pool, mg_alias, mg_device, mg_channels, mg_desc)
 
     def get_mg_channels(self, name):
-        elems = []
-        for chan in self.channel_ids[name]:
-            try:
-                elems.append(self.aliases[self.ids[chan]])
-            except KeyError as e:
-                print(e)
-        return ";".join(elems)
+        return self.get_references(name)
 
-    def proceed_controllers(self, names, sheet):
+    def iter_controllers(self, names):
         logging.info("Create controllers")
-        ctrls = []
         for ctrl in names:
             logging.info("{}".format(ctrl))
-            data = self.controller_data(ctrl)
-            ctrls.append(data)
-        ctrls = sorted(ctrls, key=lambda x: (x[0], x[2]))
-        for line, data in enumerate(ctrls):
-            write_line(sheet, line + 1, data)
+            # Read from the properties bulk loaded with the elements
+            yield self.controller_data(ctrl, self.properties)
 
-    def proceed_motors(self, names, sheet):
+    def controller_rows(self, names):
+        rows = self.iter_controllers(names)
+        return sort_rows(rows, key=lambda x: (x[0], x[2]))
+
+    def proceed_controllers(self, names, sheet):
+        write_rows(sheet, self.controller_rows(names))
+
+    def iter_motors(self, names):
         logging.info("Create motors")
-        motors = []
         for motor in names:
-            data = self.motor_data(motor, "Motor")
-            motors.append(data)
-        motors = sorted(motors, key=lambda x: (x[2], int(x[5])))
-        for line, data in enumerate(motors):
-            write_line(sheet, line + 1, data)
+            yield self.motor_data(motor, "Motor")
 
-    def proceed_pseudos(self, names, sheet):
+    def motor_rows(self, names):
+        rows = self.iter_motors(names)
+        return sort_rows(rows, key=lambda x: (x[2], int(x[5])))
+
+    def proceed_motors(self, names, sheet):
+        write_rows(sheet, self.motor_rows(names))
+
+    def iter_pseudos(self, names):
         logging.info("Create pseudo motors")
-        pseudos = []
         for motor in names:
-            data = self.motor_data(motor, "PseudoMotor")
-            pseudos.append(data)
-        pseudos = sorted(pseudos, key=lambda x: (x[2], int(x[5])))
-        for line, data in enumerate(pseudos):
-            write_line(sheet, line + 1, data)
+            yield self.motor_data(motor, "PseudoMotor")
+
+    def pseudo_rows(self, names):
+        rows = self.iter_pseudos(names)
+        return sort_rows(rows, key=lambda x: (x[2], int(x[5])))
+
+    def proceed_pseudos(self, names, sheet):
+        write_rows(sheet, self.pseudo_rows(names))
 
     def proceed_pool(self, name, sheet):
         # get_properties
@@ -312,15 +545,17 @@ class SardanaMap:
         write_line(sheet, 3, ("",))
         write_line(sheet, 4, ("prefix", "p1"))
 
-    def proceed_measgrps(self, names, sheet):
+    def iter_measgrps(self, names):
         logging.info("Create measurement groups")
-        _mgs = []
         for mg in names:
-            data = self.mg_data(mg)
-            _mgs.append(data)
-        _mgs = sorted(_mgs, key=lambda x: (x[2], x[5]))
-        for line, data in enumerate(_mgs):
-            write_line(sheet, line + 1, data)
+            yield self.mg_data(mg)
+
+    def measgrp_rows(self, names):
+        rows = self.iter_measgrps(names)
+        return sort_rows(rows, key=lambda x: (x[2], x[5]))
+
+    def proceed_measgrps(self, names, sheet):
+        write_rows(sheet, self.measgrp_rows(names))
 
     def proceed_instruments(self, instr_list, sheet):
         logging.info("Create instruments")
@@ -332,46 +567,29 @@ class SardanaMap:
             line_data = (instr_type, instr_pool, instr_name, instr_class)
             write_line(sheet, line + 1, line_data)
 
-    def proceed_iors(self, names, sheet):
+    def iter_iors(self, names):
         logging.info("Create ioregister")
-        _iors = []
         for ior in names:
-            data = self.ior_data(ior)
-            _iors.append(data)
-        _iors = sorted(_iors, key=lambda x: (x[2], x[5]))
-        for line, data in enumerate(_iors):
-            write_line(sheet, line + 1, data)
+            yield self.ior_data(ior)
 
-    def proceed_channel(self, names, sheet):
+    def ior_rows(self, names):
+        rows = self.iter_iors(names)
+        return sort_rows(rows, key=lambda x: (x[2], x[5]))
+
+    def proceed_iors(self, names, sheet):
+        write_rows(sheet, self.ior_rows(names))
+
+    def iter_channels(self, names):
         logging.info("Create channels")
-        _channels = []
         for channel, _type in names:
-            data = self.channel_data(channel, _type)
-            _channels.append(data)
-        _channels = sorted(_channels, key=lambda x: (x[2], x[5]))
-        for line, data in enumerate(_channels):
-            write_line(sheet, line + 1, data)
+            yield self.channel_data(channel, _type)
 
+    def channel_rows(self, names):
+        rows = self.iter_channels(names)
+        return sort_rows(rows, key=lambda x: (x[2], x[5]))
 
-class XlsWriter:
-    def __init__(self, template):
-        # Open xls file
-        module_path = os.path.dirname(os.path.realpath(__file__))
-        template_path = "{}/{}".format(module_path, template)
-        r_workbook = xlrd.open_workbook(template_path)
-        w_workbook = copy(r_workbook)
-        self.w_workbook = w_workbook
-        self.door_sheet = w_workbook.get_sheet(2)
-        self.controller_sheet = w_workbook.get_sheet(3)
-        self.motor_sheet = w_workbook.get_sheet(4)
-        self.pseudo_sheet = w_workbook.get_sheet(5)
-        self.servers_sheet = w_workbook.get_sheet(1)
-        self.global_sheet = w_workbook.get_sheet(0)
-        self.ior_sheet = w_workbook.get_sheet(6)
-        self.channel_sheet = w_workbook.get_sheet(7)
-        self.measurment_sheet = w_workbook.get_sheet(8)
-        self.acq_sheet = w_workbook.get_sheet(9)
-        self.instr_sheet = w_workbook.get_sheet(11)
+    def proceed_channel(self, names, sheet):
+        write_rows(sheet, self.channel_rows(names))
 
 
 default_properties = [
@@ -385,6 +603,8 @@ default_properties = [
     "__SubDevices",
 ]
 
+controller_properties = ["type", "library", "klass"]
+
 mot_attributes = [
     "EncoderSource",
     "EncoderSourceFormula",
@@ -395,9 +615,7 @@ mot_attributes = [
 ]
 
 
-def get_property(ds, name):
-    db = tango.Database()
-    proplist = db.get_device_property(ds, name)[name]
+def join_property(proplist):
     if len(proplist) > 1:
         prop = "\\n".join(proplist)
     else:
@@ -405,8 +623,11 @@ def get_property(ds, name):
     return prop
 
 
-def get_property_list(name):
-    db = tango.Database()
+def get_property(ds, name, db):
+    return join_property(db.get_device_property(ds, name)[name])
+
+
+def get_property_list(name, db):
     return [
         p
         for p in db.get_device_property_list(name, "*")
@@ -414,9 +635,15 @@ def get_property_list(name):
     ]
 
 
-def get_properties(name):
-    props = get_property_list(name)
-    return ["{}:{}".format(p, get_property(name, p)) for p in props]
+def format_properties(props, values):
+    return ["{}:{}".format(p, join_property(values[p])) for p in props]
+
+
+def get_properties(name, db):
+    props = get_property_list(name, db)
+    if not props:
+        return []
+    return format_properties(props, db.get_device_property(name, props))
 
 
 def write_line(sheet, line, data):
@@ -424,53 +651,394 @@ def write_line(sheet, line, data):
         sheet.write(line, index, d)
 
 
-def get_motor_attributes(name):
-    tango_db = tango.DeviceProxy("sys/database/2")
-    query = "Select attribute, value from property_attribute_device "
-    query += "where device='{}' and name='__value'"
-    query = query.format(name)
-    reply = tango_db.DbMySqlSelect(query)
-    reply = reply[1]
-    if "DialPosition" in reply:
-        idx = reply.index("DialPosition")
-        del reply[idx : idx + 2]
-    if "PowerOn" in reply:
-        idx = reply.index("PowerOn")
-        del reply[idx : idx + 2]
-    answer = [
-        "{}:{}".format(att, value)
-        for att, value in zip(reply[::2], reply[1::2])
-    ]
-    return answer
+def write_rows(sheet, rows, start=1):
+    for line, data in enumerate(rows, start):
+        write_line(sheet, line, data)
+
+
+def get_motor_attributes(name, db):
+    return get_attribute_values([name], db).get(name.lower(), [])
+
+
+def collect_rows(smap, workers=None, journal=None):
+    """ Sorted rows of the element sheets, lazy unless gathered by workers """
+    # Element names, the attribute of each key, are only looked up for
+    # the sheets still to collect
+    builders = {
+        "motors": smap.motor_rows,
+        "pseudos": smap.pseudo_rows,
+        "controllers": smap.controller_rows,
+        "iors": smap.ior_rows,
+        "channels": smap.channel_rows,
+        "measgrps": smap.measgrp_rows,
+    }
+    builders = {
+        k: builder
+        for k, builder in builders.items()
+        if selected(smap.sheets, k)
+    }
+
+    def build(key, rows):
+        rows = rows(getattr(smap, key))
+        if journal is None:
+            return rows
+        # Checkpointed row by row, the sheet is done once all are read
+        return journal.record(key, rows)
+
+    # Rows of a resumed export are read back from its journal
+    done = journal.phases if journal is not None else {}
+    if not workers:
+        return {
+            k: done[k] if k in done else build(k, rows)
+            for k, rows in builders.items()
+        }
+
+    def gather(key, rows):
+        with phase(key):
+            return list(build(key, rows))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            k: executor.submit(gather, k, rows)
+            for k, rows in builders.items()
+            if k not in done
+        }
+        return {
+            k: done[k] if k in done else futures[k].result() for k in builders
+        }
+
+
+def checkpointed(journal, name, sheet, proceed):
+    """ Run proceed(sheet) once, its cells replayed from the journal """
+    if name in journal:
+        cells = journal[name]
+    else:
+        recorder = RecordingSheet()
+        proceed(recorder)
+        cells = journal.record(name, recorder.cells)
+    for line, index, value in cells:
+        sheet.write(line, index, value)
+
+
+def proceed(
+    pool_name,
+    workers=None,
+    db=None,
+    listing=None,
+    previous=None,
+    fmt="xls",
+    sheets=None,
+    classes=None,
+    resume=False,
+    force=False,
+):
+    """ Export one pool in full, return the changes since a previous one """
+    previous_rows = None
+    if previous is not None:
+        previous_rows = read_workbook(previous)
+    # Nothing is loaded for the phases found in the journal
+    smap = SardanaMap(pool_name, db, listing, sheets, classes, lazy=resume)
+    writer = WRITERS[fmt]("template/template.xls")
+    # Closed on errors, removed once the workbook is saved
+    with Journal.open(
+        "{}/{}.journal".format(os.getcwd(), pool_name),
+        {"pool": pool_name, "sheets": sheets, "classes": classes},
+        resume,
+        force,
+    ) as journal:
+        diff = write_workbook(smap, writer, journal, workers, previous_rows)
+    if db is None:
+        log_database(smap.db)
+    return diff
 
 
-def proceed(pool_name):
-    smap = SardanaMap(pool_name)
-    writer = XlsWriter("template/template.xls")
-    smap.proceed_motors(smap.motors, writer.motor_sheet)
-    smap.proceed_pseudos(smap.pseudos, writer.pseudo_sheet)
-    smap.proceed_controllers(smap.controllers, writer.controller_sheet)
-    smap.proceed_pool(smap.pool_name, writer.servers_sheet)
-    smap.proceed_macroserver(smap.ms_name, writer.servers_sheet)
+def write_workbook(smap, writer, journal, workers=None, previous_rows=None):
+    """ Write and save every sheet, return the diff against previous_rows """
+    diff = None
+    sheets = smap.sheets
+    rows = collect_rows(smap, workers, journal)
+    if previous_rows is not None:
+        for key in rows:
+            with phase(key):
+                rows[key] = list(rows[key])
+        # Sheets not exported are not compared
+        previous_rows = {k: previous_rows[k] for k in rows}
+        diff = diff_rows(previous_rows, rows)
+    # Sheets are always written in the same order to get the same file
+    element_sheets = [
+        ("motors", writer.motor_sheet),
+        ("pseudos", writer.pseudo_sheet),
+        ("controllers", writer.controller_sheet),
+    ]
+    for key, sheet in element_sheets:
+        if key in rows:
+            with phase(key):
+                writer.write_rows(sheet, rows[key])
+    if selected(sheets, "servers"):
+        with phase("pool"):
+            checkpointed(
+                journal,
+                "pool",
+                writer.servers_sheet,
+                lambda sheet: smap.proceed_pool(smap.pool_name, sheet),
+            )
+        with phase("macroserver"):
+            checkpointed(
+                journal,
+                "macroserver",
+                writer.servers_sheet,
+                lambda sheet: smap.proceed_macroserver(smap.ms_name, sheet),
+            )
     smap.proceed_global(smap.pool, writer.global_sheet)
-    smap.proceed_iors(smap.iors, writer.ior_sheet)
-    smap.proceed_channel(smap.channels, writer.channel_sheet)
-    smap.proceed_measgrps(smap.measgrps, writer.acq_sheet)
-    smap.proceed_instruments(smap.instrument_list, writer.instr_sheet)
-    smap.proceed_doors(smap.doors, writer.door_sheet)
+    element_sheets = [
+        ("iors", writer.ior_sheet),
+        ("channels", writer.channel_sheet),
+        ("measgrps", writer.acq_sheet),
+    ]
+    for key, sheet in element_sheets:
+        if key in rows:
+            with phase(key):
+                writer.write_rows(sheet, rows[key])
+    if selected(sheets, "instruments"):
+        with phase("instruments"):
+            checkpointed(
+                journal,
+                "instruments",
+                writer.instr_sheet,
+                lambda sheet: smap.proceed_instruments(
+                    smap.instrument_list, sheet
+                ),
+            )
+    if selected(sheets, "doors"):
+        with phase("doors"):
+            checkpointed(
+                journal,
+                "doors",
+                writer.door_sheet,
+                lambda sheet: smap.proceed_doors(smap.doors, sheet),
+            )
+    with phase("save"):
+        path = "{}/{}.{}".format(os.getcwd(), smap.pool, writer.extension)
+        writer.save(path)
+    return diff
+
+
+def proceed_many(
+    pool_names=None,
+    jobs=1,
+    workers=None,
+    db=None,
+    fmt="xls",
+    sheets=None,
+    classes=None,
+    resume=False,
+    force=False,
+):
+    """ Export several pools (all of them by default) in one process """
+    if db is None:
+        db = DatabaseContext()
+    listing = db.get_server_listing(get_pool_servers(pool_names))
+    if not pool_names:
+        servers = listing.get_server_list("Pool/*")
+        pool_names = [server.split("/", 1)[1] for server in servers]
+    failed = []
 
-    writer.w_workbook.save("{}/{}.xls".format(os.getcwd(), pool_name))
+    def export(pool_name):
+        try:
+            proceed(
+                pool_name,
+                workers,
+                db,
+                listing,
+                fmt=fmt,
+                sheets=sheets,
+                classes=classes,
+                resume=resume,
+                force=force,
+            )
+        except Exception:
+            logging.exception("Export of {} failed".format(pool_name))
+            failed.append(pool_name)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        list(executor.map(export, pool_names))
+    return failed
+
+
+def log_database(db):
+    logging.info(
+        "Database: {} connection(s), {} round trip(s)".format(
+            db.connections, db.round_trips
+        )
+    )
 
 
 def main():
     logging.basicConfig(level=logging.DEBUG)
-    usage = "%prog [options] <pool_instance> "
+    usage = "%prog [options] <pool_instance> [<pool_instance> ...]"
     parser = argparse.ArgumentParser(usage)
     parser.add_argument(
-        "poolname", metavar="pool", type=str, help="Pool instance name"
+        "poolname",
+        metavar="pool",
+        type=str,
+        nargs="*",
+        help="Pool instance name",
+    )
+    parser.add_argument(
+        "--all", action="store_true", help="Export every Pool instance"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of pools exported in parallel",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of threads collecting the sheets (default: sequential)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Seconds before a db call times out (default: tango client's)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Number of times a timed out or failed db call is sent again",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the sheets written before an export was interrupted",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Start over, discarding the journal of an interrupted export",
+    )
+    parser.add_argument(
+        "--dump",
+        metavar="FILE",
+        help="Save a snapshot of the pools db content instead of exporting",
+    )
+    parser.add_argument(
+        "--from-snapshot",
+        metavar="FILE",
+        help="Export from a snapshot instead of the tango db",
+    )
+    parser.add_argument(
+        "--cache",
+        metavar="FILE",
+        nargs="?",
+        const=DEFAULT_CACHE,
+        help="Cache the db content between runs (default: {})".format(
+            DEFAULT_CACHE
+        ),
+    )
+    parser.add_argument(
+        "--previous",
+        metavar="FILE",
+        help="Report the element changes since a previous export as json, "
+        "the workbook is still exported in full",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(WRITERS),
+        default="xls",
+        help="Output format, xlsx is streamed and has no row limit",
+    )
+    parser.add_argument(
+        "--asyncio",
+        action="store_true",
+        help="Load the db content with concurrent asyncio queries",
+    )
+    parser.add_argument(
+        "--in-flight",
+        type=int,
+        help="Maximum number of concurrent asyncio queries (default 8)",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["table", "json"],
+        nargs="?",
+        const="table",
+        help="Print the time, db calls and bytes of each export phase",
+    )
+    parser.add_argument(
+        "--sheets",
+        type=lambda value: value.split(","),
+        help="Comma separated sheets to export, among: {}".format(
+            ",".join(SHEET_NAMES)
+        ),
+    )
+    parser.add_argument(
+        "--classes",
+        type=lambda value: value.split(","),
+        help="Comma separated element classes to export (e.g. Motor)",
     )
     args = parser.parse_args()
-    proceed(args.poolname)
+    if args.all == bool(args.poolname):
+        parser.error("Give pool instance names or --all")
+    unknown = set(args.sheets or []) - set(SHEET_NAMES)
+    if unknown:
+        parser.error("Unknown sheets: {}".format(",".join(sorted(unknown))))
+    if args.previous and len(args.poolname) != 1:
+        parser.error("--previous needs exactly one pool instance")
+    profiler = profiling.enable() if args.profile else None
+    policy = CallPolicy(args.timeout, args.retries)
+    db = DatabaseContext(policy)
+    if args.from_snapshot:
+        db = Snapshot.load(args.from_snapshot)
+    elif args.asyncio:
+        # asyncio and the PyTango green mode are only loaded when used
+        from sardana2xls import aio
+        import asyncio
+
+        limit = args.in_flight or aio.IN_FLIGHT_LIMIT
+        # The adaptive limit of the queries starts from --in-flight
+        policy = CallPolicy(args.timeout, args.retries, limit=limit)
+        context = aio.AsyncDatabaseContext(limit, policy=policy)
+        with phase("load"):
+            db = asyncio.run(aio.load_snapshot(context, args.poolname))
+        log_database(context)
+    elif args.cache:
+        db = DatabaseCache(db, args.cache)
+    if args.dump:
+        Snapshot.from_database(db, args.poolname).save(args.dump)
+    elif len(args.poolname) == 1:
+        diff = proceed(
+            args.poolname[0],
+            args.workers,
+            db,
+            previous=args.previous,
+            fmt=args.format,
+            sheets=args.sheets,
+            classes=args.classes,
+            resume=args.resume,
+            force=args.force,
+        )
+        if diff is not None:
+            print(json.dumps(diff, indent=4))
+    elif proceed_many(
+        args.poolname,
+        args.jobs,
+        args.workers,
+        db,
+        args.format,
+        args.sheets,
+        args.classes,
+        args.resume,
+        args.force,
+    ):
+        sys.exit(1)
+    log_database(db)
+    if profiler is not None:
+        print(getattr(profiler, args.profile)())
 
 
 if __name__ == "__main__":
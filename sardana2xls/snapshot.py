@@ -0,0 +1,124 @@
+from sardana2xls.utils import DeviceProperties, ServerListing
+from sardana2xls.utils import get_pool_servers
+import json
+
+
+class Snapshot:
+    """ Offline copy of the tango db content needed by the exports """
+
+    def __init__(self, host="", port=0):
+        self.host = host
+        self.port = port
+        self.listing = ServerListing()
+        self.properties = DeviceProperties()
+        self.attributes = dict()
+        # Same accounting as DatabaseContext, nothing is ever fetched
+        self.connections = 0
+        self.round_trips = 0
+
+    @classmethod
+    def from_database(cls, db, pool_names=None):
+        """ Fetch in bulk everything needed to export the pools """
+        snapshot = cls(db.get_db_host(), db.get_db_port())
+        snapshot.listing = db.get_server_listing(get_pool_servers(pool_names))
+        devices = snapshot.devices()
+        snapshot.properties = db.get_device_properties(devices)
+        snapshot.attributes = db.get_attribute_values(devices)
+        return snapshot
+
+    def devices(self):
+        """ Devices of the listed servers, the admin devices excluded """
+        return [
+            name
+            for server in self.listing.get_server_list()
+            for name in self.listing.get_device_name(server, "*")
+            if "dserver" not in name
+        ]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as fp:
+            data = json.load(fp)
+        snapshot = cls(data["host"], data["port"])
+        for server, devices in data["servers"].items():
+            for name, _cls, alias in devices:
+                snapshot.listing.add(server, name, _cls, alias)
+        for device, props in data["properties"].items():
+            for prop, values in props.items():
+                snapshot.properties.add(device, prop, values)
+        snapshot.attributes = data["attributes"]
+        return snapshot
+
+    def save(self, path):
+        data = {
+            "host": self.host,
+            "port": self.port,
+            "servers": dict(self.listing.items()),
+            "properties": dict(self.properties.items()),
+            "attributes": self.attributes,
+        }
+        with open(path, "w") as fp:
+            json.dump(data, fp, separators=(",", ":"), sort_keys=True)
+
+    # Bulk loaders, see DatabaseContext
+
+    def get_server_listing(self, servers):
+        return self.listing
+
+    def get_device_properties(self, devices):
+        return self.properties
+
+    def get_attribute_values(self, devices):
+        return self.attributes
+
+    def add_device(self, name, cls, server):
+        self.listing.add(server, name, cls)
+
+    # tango.Database API
+
+    def get_db_host(self):
+        return self.host
+
+    def get_db_port(self):
+        return self.port
+
+    def get_device_name(self, server, cls):
+        return self.listing.get_device_name(server, cls)
+
+    def get_class_for_device(self, name):
+        return self.listing.get_class_for_device(name)
+
+    def get_alias(self, name):
+        return self.listing.get_alias(name)
+
+    get_alias_from_device = get_alias
+
+    def get_device_property(self, name, prop):
+        return self.properties.get_device_property(name, prop)
+
+    def get_device_property_list(self, name, pattern="*"):
+        return self.properties.get_device_property_list(name, pattern)
+
+    def put_device_property(self, name, props):
+        for prop, values in props.items():
+            if isinstance(values, str):
+                values = [values]
+            self.properties.add(name, prop, values)
+
+    def put_device_alias(self, name, alias):
+        self.listing.set_alias(name, alias)
+
+    def put_device_attribute_property(self, name, props):
+        values = self.attributes.setdefault(name.lower(), [])
+        for attr, attr_props in props.items():
+            if "__value" not in attr_props:
+                continue
+            value = "{}:{}".format(attr, attr_props["__value"][0])
+            prefix = "{}:".format(attr).lower()
+            old = [
+                n for n, v in enumerate(values) if v.lower().startswith(prefix)
+            ]
+            if old:
+                values[old[0]] = value
+            else:
+                values.append(value)
@@ -1,12 +1,126 @@
-import tango
+from sardana2xls.profiling import record
+from sardana2xls.policy import CallPolicy
 import collections
+import collections.abc
+import fnmatch
+import sys
+import threading
+import types
 
+# Number of devices sent in one DbMySqlSelect
+QUERY_CHUNK_SIZE = 500
 
-class unique_dict(collections.MutableMapping):
+# Memorized attributes not exported
+IGNORED_ATTRIBUTES = ["dialposition", "poweron"]
+
+
+def connect():
+    """ Tango database client, PyTango is only loaded on first use """
+    import tango
+
+    return tango.Database()
+
+
+def device_info(name, cls, server):
+    """ tango.DbDevInfo of a device to register """
+    import tango
+
+    info = tango.DbDevInfo()
+    info.name, info._class, info.server = name, cls, server
+    return info
+
+
+def dev_failed():
+    """ tango.DevFailed, or nothing to catch while PyTango is not loaded """
+    tango = sys.modules.get("tango")
+    return tango.DevFailed if tango is not None else ()
+
+
+class DatabaseContext:
+    """ Tango database connection shared by one export """
+
+    def __init__(self, policy=None):
+        self._db = None
+        self._lock = threading.Lock()
+        self.policy = policy if policy is not None else CallPolicy()
+        self.connections = 0
+        self.calls = collections.Counter()
+
+    @property
+    def db(self):
+        with self._lock:
+            if self._db is None:
+                self._db = self.policy.call(connect)
+                if self.policy.timeout:
+                    timeout = int(self.policy.timeout * 1000)
+                    self._db.set_timeout_millis(timeout)
+                self.connections += 1
+        return self._db
+
+    @property
+    def round_trips(self):
+        return sum(self.calls.values())
+
+    def get_server_listing(self, servers):
+        return get_server_listing(self, servers)
+
+    def get_device_properties(self, devices):
+        return get_device_properties(devices, self)
+
+    def get_attribute_values(self, devices):
+        return get_attribute_values(devices, self)
+
+    def add_device(self, name, cls, server):
+        # tango.Database.add_device, the DbDevInfo built here
+        info = device_info(name, cls, server)
+        return DatabaseContext.__getattr__(self, "add_device")(info)
+
+    def __getattr__(self, name):
+        # Forward the tango.Database API, count the calls and retry them
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                self.calls[name] += 1
+            return record(self.policy.call(attr, *args, **kwargs))
+
+        return call
+
+
+class unique_dict(collections.abc.MutableMapping):
     def __init__(self, *args, **kwargs):
         self._store = dict()
         self._inverted = dict()
-        self.update(dict(*args, **kwargs))  # use the free update to set keys
+        self._load(dict(*args, **kwargs).items())
+
+    @classmethod
+    def from_pairs(cls, pairs, **kwargs):
+        """ Build from (key, value) pairs, faster than item by item """
+        self = cls(**kwargs)
+        self._load(pairs)
+        return self
+
+    def _load(self, pairs):
+        pairs = list(pairs)
+        store = dict(pairs)
+        inverted = {value: key for key, value in store.items()}
+        if self._store or not len(pairs) == len(store) == len(inverted):
+            # Keys or values overwritten, replay the pairs in order
+            self.update(pairs)  # use the free update to set keys
+        else:
+            self._store, self._inverted = store, inverted
+
+    @property
+    def forward(self):
+        """ Read only key to value view """
+        return types.MappingProxyType(self._store)
+
+    @property
+    def inverse(self):
+        """ Read only value to key view """
+        return types.MappingProxyType(self._inverted)
 
     def __getitem__(self, key):
         return self._store[key]
@@ -38,13 +152,127 @@ class unique_dict(collections.MutableMapping):
 
 
 class unique_bidict(unique_dict):
+    def __init__(self, *args, casefold=False, **kwargs):
+        # Keys and values in one dict, built on the first lookup
+        self._index = None
+        self._casefold = casefold
+        super().__init__(*args, **kwargs)
+
+    def _build_index(self):
+        index = dict(self._inverted)
+        index.update(self._store)
+        if self._casefold:
+            for key in list(index):
+                if isinstance(key, str):
+                    index.setdefault(key.lower(), index[key])
+        return index
+
     def __getitem__(self, key):
-        if key in self._store:
-            return self._store[key]
-        elif key in self._inverted:
-            return self._inverted[key]
-        else:
-            raise KeyError(key)
+        index = self._index
+        if index is None:
+            index = self._index = self._build_index()
+        try:
+            return index[key]
+        except KeyError:
+            if (
+                self._casefold
+                and isinstance(key, str)
+                and key.lower() in index
+            ):
+                return index[key.lower()]
+            raise
+
+    def __setitem__(self, key, value):
+        self._index = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._index = None
+        super().__delitem__(key)
+
+    def _load(self, pairs):
+        self._index = None
+        super()._load(pairs)
+
+
+class DeviceProperties:
+    """ In-memory snapshot of device properties (case insensitive) """
+
+    def __init__(self):
+        self._store = dict()
+
+    def add(self, device, prop, values):
+        props = self._store.setdefault(device.lower(), dict())
+        props[prop.lower()] = (prop, list(values))
+
+    def get_device_property(self, name, props):
+        store = self._store.get(name.lower(), {})
+        if isinstance(props, str):
+            props = [props]
+        return {p: list(store.get(p.lower(), (p, []))[1]) for p in props}
+
+    def get_device_property_list(self, name, pattern="*"):
+        props = self._store.get(name.lower(), {})
+        return [p for p, _ in props.values() if fnmatch.fnmatch(p, pattern)]
+
+    def items(self):
+        for device, props in self._store.items():
+            yield device, dict(props.values())
+
+    def __contains__(self, name):
+        return name.lower() in self._store
+
+    def __len__(self):
+        return len(self._store)
+
+
+class ServerListing:
+    """ Devices, classes and aliases of tango servers loaded in bulk """
+
+    def __init__(self):
+        self._servers = collections.OrderedDict()
+        self._classes = dict()
+        self._aliases = dict()
+
+    def add(self, server, name, cls, alias=""):
+        devices = self._servers.setdefault(server.lower(), (server, []))[1]
+        devices.append((name, cls, alias))
+        self._classes[name.lower()] = cls
+        if alias:
+            self._aliases[name.lower()] = alias
+
+    def items(self):
+        return iter(self._servers.values())
+
+    def set_alias(self, name, alias):
+        for _, devices in self._servers.values():
+            for n, (_name, cls, _) in enumerate(devices):
+                if _name.lower() == name.lower():
+                    devices[n] = (_name, cls, alias)
+        self._aliases[name.lower()] = alias
+
+    def get_server_list(self, pattern="*"):
+        return [
+            server
+            for server, _ in self._servers.values()
+            if fnmatch.fnmatch(server.lower(), pattern.lower())
+        ]
+
+    def get_device_name(self, server, cls):
+        devices = self._servers.get(server.lower(), (server, []))[1]
+        return [
+            name
+            for name, _cls, _ in devices
+            if cls == "*" or cls.lower() == _cls.lower()
+        ]
+
+    def get_class_for_device(self, name):
+        return self._classes[name.lower()]
+
+    def get_alias(self, name):
+        return self._aliases[name.lower()]
+
+    get_alias_from_device = get_alias
 
 
 # get sardana element
@@ -63,24 +291,24 @@ def get_ms_elements(instance, db):
 
 
 def generate_id_mapping(devices, db):
-    id_map = unique_bidict()
-    for name in devices:
-        prop = db.get_device_property(name, "id")["id"]
-        if not prop:
-            continue
-        id_map[prop[0]] = name
-    return id_map
+    props = (
+        (db.get_device_property(name, "id")["id"], name) for name in devices
+    )
+    return unique_bidict.from_pairs((p[0], name) for p, name in props if p)
 
 
-def generate_aliases_mapping(devices, db):
-    alias_map = unique_bidict()
+def get_alias_pairs(devices, db):
     for name in devices:
         try:
-            alias = db.get_alias(name)
-        except tango.DevFailed:
+            yield db.get_alias(name), name
+        except (dev_failed(), KeyError):
             continue
-        alias_map[alias] = name
-    return alias_map
+
+
+def generate_aliases_mapping(devices, db):
+    """ Alias to device mapping, tango names are case insensitive """
+    pairs = get_alias_pairs(devices, db)
+    return unique_bidict.from_pairs(pairs, casefold=True)
 
 
 def generate_instrument_list(pool, db):
@@ -98,10 +326,9 @@ def generate_instrument_list(pool, db):
 
 
 def generate_instrument_mapping(instr_list):
-    id_map = unique_bidict()
-    for instr in instr_list:
-        id_map[instr[2]] = instr[1]
-    return id_map
+    return unique_bidict.from_pairs(
+        (instr[2], instr[1]) for instr in instr_list
+    )
 
 
 def generate_prop_mapping(devices, db, prop_name):
@@ -114,39 +341,156 @@ def generate_prop_mapping(devices, db, prop_name):
     return id_map
 
 
-def generate_class_mapping(devices, db):
-    return {d: db.get_class_for_device(d) for d in devices}
+def chunks(iterable, size):
+    iterable = list(iterable)
+    for n in range(0, len(iterable), size):
+        yield iterable[n : n + size]
 
 
-if __name__ == "__main__":
-    db = tango.Database()
-    elements = get_elements("Femtomax", db)
-    aliases = generate_aliases_mapping(elements, db)
-    ids = generate_id_mapping(elements, db)
-    ctrl_ids = generate_prop_mapping(elements, db, "ctrl_id")
-    motor_ids = generate_prop_mapping(elements, db, "motor_role_ids")
-    pseudo_ids = generate_prop_mapping(elements, db, "pseudo_motor_role_ids")
-    import networkx as nx
-    import matplotlib.pyplot as plt
-
-    # import pydot
-    G = nx.Graph()
-    G.add_nodes_from(ids.values())
-
-    def add_edge(iterable):
-        for name, elems in iterable.items():
-            for e in elems:
-                G.add_edge(name, ids[e])
-
-    add_edge(motor_ids)
-    add_edge(pseudo_ids)
-    add_edge(ctrl_ids)
-
-    nx.draw(
-        G,
-        node_size=100,
-        cmap=plt.cm.Blues,
-        node_color=range(len(G)),
-        prog="dot",
-        with_labels=True,
-    )
+def quote(value):
+    value = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return "'{}'".format(value)
+
+
+def mysql_select(db, query):
+    """ Run a read only query on the tango db, return the flat value list """
+    return db.command_inout("DbMySqlSelect", query)[1]
+
+
+class Select:
+    """ DbMySqlSelect returning typed rows, sent in chunks of devices """
+
+    def __init__(self, name, columns, query):
+        self.row = collections.namedtuple(name, columns)
+        self.query = query
+
+    def queries(self, devices, chunk_size=QUERY_CHUNK_SIZE, **params):
+        """ Format the query once per chunk of quoted device names """
+        for chunk in chunks(devices, chunk_size):
+            names = ",".join(map(quote, chunk))
+            yield self.query.format(devices=names, **params)
+
+    def rows(self, reply):
+        """ Rows of a flat reply, read in place without slicing it """
+        values = iter(reply)
+        return map(self.row._make, zip(*[values] * len(self.row._fields)))
+
+    def select(self, db, devices, chunk_size=QUERY_CHUNK_SIZE, **params):
+        """ Rows of all the chunks, one DbMySqlSelect per chunk """
+        for query in self.queries(devices, chunk_size, **params):
+            yield from self.rows(mysql_select(db, query))
+
+
+PROPERTIES = Select(
+    "PropertyRow",
+    "device name value",
+    "select device, name, value from property_device "
+    "where device in ({devices}) order by device, name, count",
+)
+
+# Classes and aliases of the devices come with the listing
+LISTING = Select(
+    "ListingRow",
+    "server name cls alias",
+    "select server, name, class, alias from device where {where} order by name",
+)
+
+ATTRIBUTES = Select(
+    "AttributeRow",
+    "device attribute value",
+    "select device, attribute, value from property_attribute_device "
+    "where device in ({devices}) and name='__value'",
+)
+
+HISTORY = Select(
+    "HistoryRow",
+    "device date",
+    "select device, max(date) from {table} where device in ({devices}) "
+    "group by device",
+)
+
+
+def property_queries(devices, chunk_size=QUERY_CHUNK_SIZE):
+    return PROPERTIES.queries(devices, chunk_size)
+
+
+def parse_properties(replies):
+    properties = DeviceProperties()
+    for reply in replies:
+        values = collections.OrderedDict()
+        for row in PROPERTIES.rows(reply):
+            values.setdefault((row.device, row.name), []).append(row.value)
+        for (device, name), value in values.items():
+            properties.add(device, name, value)
+    return properties
+
+
+def get_device_properties(devices, db, chunk_size=QUERY_CHUNK_SIZE):
+    """ Load every property of the devices with a few DbMySqlSelect """
+    queries = property_queries(devices, chunk_size)
+    return parse_properties(mysql_select(db, query) for query in queries)
+
+
+def like(pattern):
+    """ Convert a tango wildcard pattern to a quoted sql like pattern """
+    pattern = pattern.replace("\\", "\\\\").replace("_", "\\_")
+    return quote(pattern.replace("%", "\\%").replace("*", "%"))
+
+
+def get_pool_servers(pool_names=None):
+    """ Pool and MacroServer servers of the pools, all of them by default """
+    if not pool_names:
+        return ["Pool/*", "MacroServer/*"]
+    return [
+        "{}/{}".format(server, name)
+        for name in pool_names
+        for server in ("Pool", "MacroServer")
+    ]
+
+
+def listing_query(servers):
+    where = " or ".join("server like {}".format(like(s)) for s in servers)
+    return LISTING.query.format(where=where)
+
+
+def parse_listing(reply):
+    listing = ServerListing()
+    for row in LISTING.rows(reply):
+        listing.add(*row)
+    return listing
+
+
+def get_server_listing(db, servers=("Pool/*", "MacroServer/*")):
+    """ Load the devices of the servers with one DbMySqlSelect """
+    return parse_listing(mysql_select(db, listing_query(servers)))
+
+
+def attribute_queries(devices, chunk_size=QUERY_CHUNK_SIZE):
+    return ATTRIBUTES.queries(devices, chunk_size)
+
+
+def parse_attributes(replies):
+    attributes = dict()
+    for reply in replies:
+        for row in ATTRIBUTES.rows(reply):
+            if row.attribute.lower() in IGNORED_ATTRIBUTES:
+                continue
+            values = attributes.setdefault(row.device.lower(), [])
+            values.append("{}:{}".format(row.attribute, row.value))
+    return attributes
+
+
+def get_attribute_values(devices, db, chunk_size=QUERY_CHUNK_SIZE):
+    """ Load memorized attributes as "attr:value" lists by device """
+    queries = attribute_queries(devices, chunk_size)
+    return parse_attributes(mysql_select(db, query) for query in queries)
+
+
+def get_history_stamps(devices, db, table, chunk_size=QUERY_CHUNK_SIZE):
+    """ Date of the last change of each device in a tango history table """
+    rows = HISTORY.select(db, devices, chunk_size, table=table)
+    return {row.device.lower(): row.date for row in rows}
+
+
+def generate_class_mapping(devices, db):
+    return {d: db.get_class_for_device(d) for d in devices}
@@ -0,0 +1,162 @@
+import os
+
+# Writer attribute of each template sheet
+SHEETS = [
+    "global_sheet",
+    "servers_sheet",
+    "door_sheet",
+    "controller_sheet",
+    "motor_sheet",
+    "pseudo_sheet",
+    "ior_sheet",
+    "channel_sheet",
+    "measurment_sheet",
+    "acq_sheet",
+    "parameter_sheet",
+    "instr_sheet",
+]
+
+
+def template_path(template):
+    module_path = os.path.dirname(os.path.realpath(__file__))
+    return "{}/{}".format(module_path, template)
+
+
+class XlsWriter:
+    extension = "xls"
+
+    def __init__(self, template):
+        # xlrd and xlutils are only loaded when an xls export is written
+        import xlrd
+        from xlutils.copy import copy
+
+        # Open xls file
+        r_workbook = xlrd.open_workbook(template_path(template))
+        w_workbook = copy(r_workbook)
+        self.w_workbook = w_workbook
+        for index, name in enumerate(SHEETS):
+            setattr(self, name, w_workbook.get_sheet(index))
+        self.styles = dict()
+
+    def style_index(self, style):
+        """ Index of a style in the workbook, looked up once """
+        if style not in self.styles:
+            self.styles[style] = self.w_workbook.add_style(style)
+        return self.styles[style]
+
+    def write_rows(self, sheet, rows, start=1, style=None):
+        """ Write rows of values, the style is looked up once """
+        import xlwt
+        from xlwt.Cell import StrCell, BlankCell
+
+        if style is None:
+            style = xlwt.Style.default_style
+        xf_index = self.style_index(style)
+        add_str = self.w_workbook.add_str
+        for line, data in enumerate(rows, start):
+            row = sheet.row(line)
+            last = len(data) - 1
+            for index, value in enumerate(data):
+                if 0 < index < last and isinstance(value, str):
+                    # Height and used columns are set by the outer cells
+                    if value:
+                        cell = StrCell(line, index, xf_index, add_str(value))
+                    else:
+                        cell = BlankCell(line, index, xf_index)
+                    row.insert_cell(index, cell)
+                else:
+                    row.write(index, value, style)
+
+    def save(self, path):
+        self.w_workbook.save(path)
+
+
+class StreamingSheet:
+    """ Sheet flushing each row as soon as a following one is written """
+
+    def __init__(self, sheet, template_rows):
+        self.sheet = sheet
+        self.template_rows = template_rows
+        self.line = -1
+        self.row = []
+
+    def _template_row(self, line):
+        if line < len(self.template_rows):
+            return list(self.template_rows[line])
+        return []
+
+    def _move(self, line):
+        while self.line < line:
+            if self.line >= 0:
+                self.sheet.append(self.row)
+            self.line += 1
+            self.row = self._template_row(self.line)
+
+    def write(self, line, index, value):
+        if line < self.line:
+            raise ValueError(
+                "Row {} written after row {}".format(line, self.line)
+            )
+        self._move(line)
+        self.row += [None] * (index + 1 - len(self.row))
+        self.row[index] = value
+
+    def write_row(self, line, values):
+        if line < self.line:
+            raise ValueError(
+                "Row {} written after row {}".format(line, self.line)
+            )
+        self._move(line)
+        self.row += [None] * (len(values) - len(self.row))
+        self.row[: len(values)] = values
+
+    def close(self):
+        self._move(max(self.line, len(self.template_rows) - 1) + 1)
+
+
+class XlsxWriter:
+    """ Constant memory xlsx writer (openpyxl write-only mode) """
+
+    extension = "xlsx"
+
+    def __init__(self, template):
+        import openpyxl
+
+        # The template is read from a file object, openpyxl refuses .xls
+        with open(template_path(template), "rb") as fp:
+            r_workbook = openpyxl.load_workbook(fp, read_only=True)
+            templates = [
+                (sheet.title, read_rows(sheet)) for sheet in r_workbook
+            ]
+            r_workbook.close()
+        self.w_workbook = openpyxl.Workbook(write_only=True)
+        self.sheets = []
+        for name, (title, rows) in zip(SHEETS, templates):
+            sheet = StreamingSheet(self.w_workbook.create_sheet(title), rows)
+            self.sheets.append(sheet)
+            setattr(self, name, sheet)
+
+    def write_rows(self, sheet, rows, start=1):
+        for line, data in enumerate(rows, start):
+            sheet.write_row(line, data)
+
+    def save(self, path):
+        for sheet in self.sheets:
+            sheet.close()
+        self.w_workbook.save(path)
+
+
+def read_rows(sheet):
+    """ Template rows without the trailing empty cells and rows """
+    rows = []
+    for row in sheet.iter_rows(values_only=True):
+        row = list(row)
+        while row and row[-1] is None:
+            row.pop()
+        rows.append(row)
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+WRITERS = {"xls": XlsWriter, "xlsx": XlsxWriter}
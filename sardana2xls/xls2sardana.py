@@ -0,0 +1,222 @@
+from sardana2xls.delta import read_workbook
+from sardana2xls.snapshot import Snapshot
+from sardana2xls.utils import DatabaseContext, get_pool_servers
+import collections
+import argparse
+import json
+import logging
+
+# Element sheets: alias, device, axis and attributes columns
+ELEMENT_COLUMNS = collections.OrderedDict(
+    [
+        ("motors", (3, 4, 5, 8)),
+        ("pseudos", (3, 4, 5, 8)),
+        ("iors", (3, 4, 5, 8)),
+        ("channels", (3, 4, 5, 8)),
+        ("measgrps", (2, 3, None, None)),
+    ]
+)
+
+# Servers sheet: class, server, alias and device columns
+SERVER_COLUMNS = (0, 2, 4, 5)
+
+# Controller sheet columns written as properties
+CONTROLLER_COLUMNS = [("type", 0), ("library", 3), ("klass", 4)]
+
+
+def cell(value):
+    """ Cell as the string exported, numbers typed in excel included """
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def parse_pairs(text):
+    """ "name:value;name:value" cells as (name, value) pairs"""
+    return [item.partition(":")[::2] for item in text.split(";") if item]
+
+
+def read_pool(path):
+    """ Pool instance exported in a workbook """
+    import xlrd
+
+    return cell(
+        xlrd.open_workbook(path).sheet_by_name("Global").cell_value(0, 1)
+    )
+
+
+def read_servers(path):
+    """ Rows of the Servers sheet of a workbook """
+    import xlrd
+
+    sheet = xlrd.open_workbook(path).sheet_by_name("Servers")
+    return [sheet.row_values(n) for n in range(1, sheet.nrows)]
+
+
+def read_settings(rows, servers=()):
+    """ Alias, properties and attribute values of the exported elements """
+    elements = collections.OrderedDict()
+    # Server and class, to add the devices missing from the db
+    pool_server = None
+    for row in servers:
+        row = [cell(value) for value in row]
+        cls, server, alias, device = [row[n] for n in SERVER_COLUMNS]
+        if not device:
+            continue
+        elements[device] = {
+            "alias": alias,
+            "server": server,
+            "class": cls,
+            "properties": {},
+            "attributes": {},
+        }
+        if cls == "Pool":
+            pool_server = server
+    for key, (alias, device, axis, attributes) in ELEMENT_COLUMNS.items():
+        for row in rows.get(key, []):
+            row = [cell(value) for value in row]
+            if len(row) <= device or not row[device]:
+                continue
+            settings = elements.setdefault(
+                row[device], {"properties": {}, "attributes": {}}
+            )
+            settings["alias"] = row[alias]
+            if pool_server is not None:
+                settings["server"] = pool_server
+                settings["class"] = row[0]
+            if axis is not None and row[axis]:
+                settings["properties"]["axis"] = [row[axis]]
+            if attributes is not None and len(row) > attributes:
+                settings["attributes"].update(parse_pairs(row[attributes]))
+    # Controllers are only named by their alias in the workbook
+    controllers = collections.OrderedDict()
+    for row in rows.get("controllers", []):
+        row = [cell(value) for value in row]
+        if len(row) < 6 or not row[2]:
+            continue
+        props = {name: [row[column]] for name, column in CONTROLLER_COLUMNS}
+        for name, value in parse_pairs(row[5]):
+            props[name] = value.split("\\n")
+        controllers[row[2]] = props
+    return elements, controllers
+
+
+def plan_changes(rows, db, pool, servers=()):
+    """ Changes to apply to the db, as [old, new] values by device """
+    elements, controllers = read_settings(rows, servers)
+    listing = db.get_server_listing(get_pool_servers([pool]))
+    devices = dict()
+    for _, names in listing.items():
+        for name, _, alias in names:
+            devices[name.lower()] = (name, alias)
+    by_alias = {alias.lower(): name for name, alias in devices.values()}
+    missing = []
+    for alias, props in controllers.items():
+        name = by_alias.get(alias.lower())
+        if name is None:
+            missing.append(alias)
+            continue
+        elements.setdefault(name, {"properties": {}, "attributes": {}})
+        elements[name]["properties"].update(props)
+    known = [name for name in elements if name.lower() in devices]
+    added = []
+    for name, settings in elements.items():
+        if name.lower() in devices:
+            continue
+        if "server" in settings:
+            added.append(name)
+            devices[name.lower()] = (name, "")
+        else:
+            missing.append(name)
+    props = db.get_device_properties(known)
+    attributes = db.get_attribute_values(known)
+    changes = collections.OrderedDict()
+    new = set(added)
+    for name in known + added:
+        settings = elements[name]
+        device, alias = devices[name.lower()]
+        change = collections.OrderedDict()
+        if name in new:
+            change["add"] = [settings["server"], settings["class"]]
+        if settings.get("alias") and settings["alias"] != alias:
+            change["alias"] = [alias, settings["alias"]]
+        current = props.get_device_property(
+            device, list(settings["properties"])
+        )
+        diff = {
+            prop: [current[prop], values]
+            for prop, values in settings["properties"].items()
+            if current[prop] != values
+        }
+        if diff:
+            change["properties"] = diff
+        exported = attributes.get(name.lower(), [])
+        current = dict(parse_pairs(";".join(exported)))
+        diff = {
+            attr: [current.get(attr), value]
+            for attr, value in settings["attributes"].items()
+            if current.get(attr) != value
+        }
+        if diff:
+            change["attributes"] = diff
+        if change:
+            changes[device] = change
+    for name in missing:
+        logging.warning("{} not found in the db, skipped".format(name))
+    return changes
+
+
+def apply_changes(changes, db):
+    """ Write the changes, at most one call per device and kind of value """
+    for device, change in changes.items():
+        if "add" in change:
+            server, cls = change["add"]
+            db.add_device(device, cls, server)
+        if "properties" in change:
+            props = {k: new for k, (_, new) in change["properties"].items()}
+            db.put_device_property(device, props)
+        if "alias" in change:
+            db.put_device_alias(device, change["alias"][1])
+        if "attributes" in change:
+            values = {
+                attr: {"__value": [new]}
+                for attr, (_, new) in change["attributes"].items()
+            }
+            db.put_device_attribute_property(device, values)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Apply a workbook exported by sardana2xls to the db"
+    )
+    parser.add_argument("workbook", help="Workbook written by sardana2xls")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the changes as json without writing them",
+    )
+    parser.add_argument(
+        "--snapshot",
+        metavar="FILE",
+        help="Apply to a snapshot file instead of the tango db",
+    )
+    args = parser.parse_args()
+    db = DatabaseContext()
+    if args.snapshot:
+        db = Snapshot.load(args.snapshot)
+    rows = read_workbook(args.workbook)
+    changes = plan_changes(
+        rows, db, read_pool(args.workbook), read_servers(args.workbook)
+    )
+    if args.dry_run:
+        print(json.dumps(changes, indent=4))
+        return
+    apply_changes(changes, db)
+    if args.snapshot:
+        db.save(args.snapshot)
+    logging.info("{} device(s) updated".format(len(changes)))
+
+
+if __name__ == "__main__":
+    main()
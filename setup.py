@@ -16,7 +16,13 @@ setup(
     include_package_data=True,
     package_data={"": ["*.xls"]},
     entry_points={
-        "console_scripts": ["sardana2xls = sardana2xls.sardana2xls:main"]
+        "console_scripts": [
+            "sardana2xls = sardana2xls.sardana2xls:main",
+            "sardana2xls-bench = sardana2xls.bench:main",
+            "xls2sardana = sardana2xls.xls2sardana:main",
+            "sardana2xls-graph = sardana2xls.graph:main",
+        ]
     },
     install_requires=["setuptools", "pytango", "xlrd", "xlutils"],
+    extras_require={"xlsx": ["openpyxl"]},
 )
@@ -0,0 +1,153 @@
+import pytest
+import os
+import json
+import re
+from fnmatch import fnmatch
+from sardana2xls import sardana2xls
+from sardana2xls import utils
+
+
+class DatabaseMock:
+    def __init__(self):
+        test_path = os.path.dirname(os.path.realpath(__file__))
+        with open("{}/tangodb.json".format(test_path), "r") as fp:
+            self.data = json.load(fp)
+        self.history = {}
+        self.queries = []
+
+    def get_device_name(self, server, cls):
+        server, instance = server.split("/")
+        if cls == "*":
+            devices = []
+            for cls in self.data["servers"][server][instance].values():
+                devices += cls.keys()
+            return devices
+        return list(self.data["servers"][server][instance][cls].keys())
+
+    def get_device_property(self, name, prop):
+        for _, instance in self.data["servers"].items():
+            for _, classes in instance.items():
+                for _, devices in classes.items():
+                    for device, props in devices.items():
+                        if name.lower() == device.lower():
+                            if prop == "Angleconversion":
+                                print(prop)
+                            values = {
+                                k.lower(): v
+                                for k, v in props["properties"].items()
+                            }
+                            if isinstance(prop, str):
+                                return {prop: values.get(prop.lower(), [])}
+                            return {p: values.get(p.lower(), []) for p in prop}
+
+    def get_device_property_list(self, name, props):
+        for _, instance in self.data["servers"].items():
+            for _, classes in instance.items():
+                for _, devices in classes.items():
+                    for device, props in devices.items():
+                        if name.lower() == device.lower():
+                            return props["properties"].keys()
+
+    def command_inout(self, cmd, query):
+        assert cmd == "DbMySqlSelect"
+        self.queries.append(query)
+        reply = []
+        if "from device " in query:
+            patterns = re.findall(r"like '((?:[^'\\]|\\.)*)'", query)
+            patterns = [
+                p.replace("\\\\", "\\").replace("\\_", "_").replace("%", "*")
+                for p in patterns
+            ]
+            for server, instance in self.data["servers"].items():
+                for name, classes in instance.items():
+                    full_name = "{}/{}".format(server, name)
+                    if not any(fnmatch(full_name, p) for p in patterns):
+                        continue
+                    for cls, devices in classes.items():
+                        for device in devices:
+                            alias = devices[device].get("alias", "")
+                            reply += [full_name, device, cls, alias]
+            return [], reply
+        names = [name.lower() for name in re.findall(r"'([^']*)'", query)]
+        for _, instance in self.data["servers"].items():
+            for _, classes in instance.items():
+                for _, devices in classes.items():
+                    for device, props in devices.items():
+                        if device.lower() not in names:
+                            continue
+                        if "_hist " in query:
+                            date = "2019-07-15 00:00:00"
+                            date = self.history.get(device.lower(), date)
+                            reply += [device, date]
+                            continue
+                        if "property_attribute_device" in query:
+                            attr = props.get("attribute_properties", {})
+                            for name, value in attr.items():
+                                for v in value.get("__value", []):
+                                    reply += [device, name, v]
+                            continue
+                        for prop, values in props["properties"].items():
+                            for value in values:
+                                reply += [device, prop, value]
+        return [], reply
+
+    def get_alias(self, name):
+        for a, instance in self.data["servers"].items():
+            for _, classes in instance.items():
+                for _, devices in classes.items():
+                    for device, props in devices.items():
+                        if name.lower() == device.lower():
+                            return props.get("alias", "")
+
+    # TODO: Fix it
+    get_alias_from_device = get_alias
+
+    def get_class_for_device(self, name):
+        for a, instance in self.data["servers"].items():
+            for _, classes in instance.items():
+                for cls, devices in classes.items():
+                    for device in devices.keys():
+                        if name.lower() == device.lower():
+                            return cls
+
+    def device(self, name):
+        for _, instance in self.data["servers"].items():
+            for _, classes in instance.items():
+                for _, devices in classes.items():
+                    for device, props in devices.items():
+                        if name.lower() == device.lower():
+                            return props
+
+    def add_device(self, info):
+        server, instance = info.server.split("/")
+        classes = self.data["servers"].setdefault(server, {})
+        devices = classes.setdefault(instance, {}).setdefault(info._class, {})
+        devices[info.name] = {"properties": {}}
+
+    def put_device_property(self, name, props):
+        for prop, values in props.items():
+            self.device(name)["properties"][prop] = list(values)
+
+    def put_device_alias(self, name, alias):
+        self.device(name)["alias"] = alias
+
+    def put_device_attribute_property(self, name, props):
+        attributes = self.device(name).setdefault("attribute_properties", {})
+        for attr, values in props.items():
+            attributes.setdefault(attr, {}).update(values)
+
+    def get_db_host(self):
+        return "hello"
+
+    def get_db_port(self):
+        return 1234
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    monkeypatch.setattr(utils, "connect", DatabaseMock)
+
+
+@pytest.fixture
+def smap(mock_db):
+    return sardana2xls.SardanaMap("B108A")
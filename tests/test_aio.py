@@ -0,0 +1,94 @@
+from sardana2xls import sardana2xls
+from sardana2xls import aio
+from sardana2xls.policy import CallPolicy
+from conftest import DatabaseMock
+import asyncio
+
+
+class AsyncProxyMock:
+    def __init__(self, faults=0):
+        self.db = DatabaseMock()
+        # Number of calls timing out first
+        self.faults = faults
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_db_host(self):
+        return self.db.get_db_host()
+
+    def get_db_port(self):
+        return self.db.get_db_port()
+
+    async def command_inout(self, cmd, query):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        if self.faults:
+            self.faults -= 1
+            raise TimeoutError(query)
+        return self.db.command_inout(cmd, query)
+
+
+def chunked(queries):
+    def small_chunks(devices):
+        return queries(devices, chunk_size=10)
+
+    return small_chunks
+
+
+def test_asyncio(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sardana2xls.proceed("B108A")
+    live = (tmp_path / "B108A.xls").read_bytes()
+    proxy = AsyncProxyMock()
+    db = aio.AsyncDatabaseContext(limit=2, proxy=proxy)
+    monkeypatch.setattr(aio, "property_queries", chunked(aio.property_queries))
+    smap = asyncio.run(aio.create_map("B108A", db))
+    assert db.round_trips > 3
+    assert proxy.max_in_flight == 2
+    sardana2xls.proceed("B108A", db=smap.db)
+    assert (tmp_path / "B108A.xls").read_bytes() == live
+
+
+def test_asyncio_retry(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sardana2xls.proceed("B108A")
+    live = (tmp_path / "B108A.xls").read_bytes()
+    proxy = AsyncProxyMock(faults=2)
+    policy = CallPolicy(backoff=0)
+    db = aio.AsyncDatabaseContext(proxy=proxy, policy=policy)
+    smap = asyncio.run(aio.create_map("B108A", db))
+    assert policy.retried == 2
+    sardana2xls.proceed("B108A", db=smap.db)
+    assert (tmp_path / "B108A.xls").read_bytes() == live
+
+
+def test_asyncio_backoff():
+    proxy = AsyncProxyMock(faults=1)
+    policy = CallPolicy(backoff=0.05)
+    db = aio.AsyncDatabaseContext(limit=1, proxy=proxy, policy=policy)
+
+    async def run():
+        return await asyncio.gather(db.select("'a'"), db.select("'b'"))
+
+    asyncio.run(run())
+    # The second query is sent during the backoff of the first one
+    assert proxy.db.queries == ["'b'", "'a'"]
+
+
+def test_asyncio_adaptive_limit():
+    proxy = AsyncProxyMock()
+    policy = CallPolicy(limit=4)
+    db = aio.AsyncDatabaseContext(limit=4, proxy=proxy, policy=policy)
+    # As after two timeouts
+    policy.limiter.overload()
+    policy.limiter.overload()
+
+    async def run():
+        return await asyncio.gather(db.select("'a'"), db.select("'b'"))
+
+    asyncio.run(run())
+    assert proxy.max_in_flight == 1
+    # Grown back by the successes reported to the policy
+    assert policy.limiter.limit == 2
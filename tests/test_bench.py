@@ -0,0 +1,41 @@
+from sardana2xls import bench
+from sardana2xls.sardana2xls import SardanaMap
+
+
+def test_synthetic_snapshot():
+    snapshot = bench.synthetic_snapshot("bench", 40, 10, 10, 2, 5)
+    smap = SardanaMap("bench", snapshot)
+    assert len(smap.motors) == 40
+    assert len(smap.pseudos) == 10
+    assert len(smap.channels) == 10
+    assert len(smap.measgrps) == 2
+    assert len(smap.iors) == 5
+    # 2 motor controllers, 1 pseudo, 1 channel and 1 ior controller
+    assert len(smap.controllers) == 5
+
+
+def test_run():
+    timings = bench.run(50, latency=0.001)
+    assert list(timings) == [
+        "init",
+        "motors",
+        "pseudos",
+        "controllers",
+        "pool",
+        "macroserver",
+        "global",
+        "iors",
+        "channels",
+        "measgrps",
+        "instruments",
+        "doors",
+        "save",
+        "calls",
+    ]
+    assert timings["init"] >= 0.001
+    assert timings["calls"] > 0
+
+
+def test_compare_writes():
+    timings = bench.compare_writes(100)
+    assert list(timings) == ["per cell", "bulk"]
@@ -0,0 +1,35 @@
+from sardana2xls import sardana2xls
+from sardana2xls.cache import DatabaseCache
+from sardana2xls.utils import DatabaseContext
+
+
+def property_queries(db):
+    return [q for q in db.db.db.queries if "from property_device " in q]
+
+
+def test_cache(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "cache.sqlite")
+    sardana2xls.proceed("B108A")
+    live = (tmp_path / "B108A.xls").read_bytes()
+    # First run fills the cache
+    db = DatabaseCache(DatabaseContext(), path)
+    sardana2xls.proceed("B108A", db=db)
+    assert db.hits == 0
+    assert len(property_queries(db)) == 1
+    assert (tmp_path / "B108A.xls").read_bytes() == live
+    # Nothing changed, nothing is fetched
+    db = DatabaseCache(DatabaseContext(), path)
+    sardana2xls.proceed("B108A", db=db)
+    assert db.misses == 0
+    assert property_queries(db) == []
+    assert (tmp_path / "B108A.xls").read_bytes() == live
+    # Only the modified device is fetched again
+    db = DatabaseCache(DatabaseContext(), path)
+    db.db.db.history["b108a-fe/opt/mm-01-x"] = "2019-07-16 00:00:00"
+    sardana2xls.proceed("B108A", db=db)
+    assert db.misses == 2
+    queries = property_queries(db)
+    assert len(queries) == 1
+    assert "'b108a-fe/opt/mm-01-x'" in queries[0]
+    assert (tmp_path / "B108A.xls").read_bytes() == live
@@ -0,0 +1,50 @@
+from sardana2xls import sardana2xls
+from sardana2xls import delta
+
+
+def motor(name, axis, attributes=""):
+    return (
+        "Motor",
+        "pool",
+        "ctrl",
+        name,
+        name + "/dev",
+        axis,
+        "",
+        "",
+        attributes,
+    )
+
+
+def test_diff_rows():
+    previous = {"motors": [motor("a", "1"), motor("b", "2"), motor("c", "3")]}
+    previous["motors"][0] += ("", "")  # xlrd pads the rows
+    current = {
+        "motors": [
+            motor("a", "1"),
+            motor("b", "2", "Sign:-1"),
+            motor("d", "4"),
+        ]
+    }
+    diff = delta.diff_rows(previous, current)
+    assert list(diff) == ["motors"]
+    assert diff["motors"] == {
+        "added": ["d/dev"],
+        "removed": ["c/dev"],
+        "changed": ["b/dev"],
+    }
+
+
+def test_proceed_previous(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert sardana2xls.proceed("B108A") is None
+    path = str(tmp_path / "B108A.xls")
+    assert sardana2xls.proceed("B108A", previous=path) == {}
+    rows = delta.read_workbook(path)
+    rows["motors"].pop()
+    rows["controllers"][0][5] = "host:elsewhere"
+    diff = delta.diff_rows(
+        rows, sardana2xls.collect_rows(sardana2xls.SardanaMap("B108A"))
+    )
+    assert len(diff["motors"]["added"]) == 1
+    assert len(diff["controllers"]["changed"]) == 1
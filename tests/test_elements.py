@@ -0,0 +1,52 @@
+from sardana2xls.elements import Element, ElementRegistry
+from sardana2xls.utils import DeviceProperties, ServerListing
+import pytest
+
+
+@pytest.fixture
+def registry():
+    listing = ServerListing()
+    props = DeviceProperties()
+    devices = [
+        ("controller/ctrl/motctrl", "Controller", "motctrl", "1", None),
+        ("pool/motor/1", "Motor", "mot1", "2", "1"),
+        ("pool/motor/2", "Motor", "", "3", "1"),
+        ("controller/ctrl/pseudo", "Controller", "pseudo", "4", None),
+    ]
+    for name, cls, alias, _id, ctrl_id in devices:
+        listing.add("Pool/test", name, cls, alias)
+        props.add(name, "id", [_id])
+        if ctrl_id:
+            props.add(name, "ctrl_id", [ctrl_id])
+    props.add("controller/ctrl/pseudo", "motor_role_ids", ["2", "3"])
+    names = [name for name, *_ in devices]
+    return ElementRegistry.load(names, listing, props)
+
+
+def test_slots():
+    element = Element("pool/motor/1", "Motor")
+    with pytest.raises(AttributeError):
+        element.description = ""
+
+
+def test_registry(registry):
+    assert len(registry) == 4
+    assert registry.names("motor") == ["pool/motor/1", "pool/motor/2"]
+    assert registry["POOL/MOTOR/1"].alias == "mot1"
+    assert registry.alias_of_id("2") == "mot1"
+    assert registry.controller("pool/motor/2").alias == "motctrl"
+    assert registry["controller/ctrl/pseudo"].refs == ("2", "3")
+    driven = registry.elements_of("controller/ctrl/motctrl")
+    assert [e.name for e in driven] == ["pool/motor/1", "pool/motor/2"]
+    with pytest.raises(KeyError):
+        registry.alias("pool/motor/2")
+    with pytest.raises(KeyError):
+        registry.alias_of_id("3")
+
+
+def test_sardana_map(smap):
+    assert len(smap.registry) == len(smap.elements)
+    motor = smap.registry[smap.motors[0]]
+    assert smap.registry.by_id[motor.id] is motor
+    assert smap.registry.controller(motor.name).cls == "Controller"
+    assert smap.doors == smap.ms_registry.names("Door")
@@ -0,0 +1,61 @@
+from sardana2xls import bench
+from sardana2xls import graph as graph_module
+from sardana2xls.elements import ElementRegistry
+from sardana2xls.graph import DependencyGraph, load_graph
+from sardana2xls.snapshot import Snapshot
+from sardana2xls.utils import DatabaseContext
+import pytest
+import sys
+
+
+def registry(pool):
+    snapshot = bench.synthetic_snapshot(pool, 40, 10, 10, 2)
+    names = snapshot.listing.get_device_name("Pool/{}".format(pool), "*")
+    return ElementRegistry.load(names, snapshot.listing, snapshot.properties)
+
+
+def test_dependents():
+    graph = DependencyGraph.build([registry("a"), registry("b")])
+    # Same sardana ids in both pools, resolved in each pool
+    assert len(graph) == 2 * len(registry("a"))
+    pseudo_ctrl = graph.dependencies("a/pseudo/0")[0]
+    assert pseudo_ctrl.name == "a/controller/pseudo_0"
+    roles = graph.references("a/controller/pseudo_0")
+    assert [e.name for e in roles] == ["a/motor/0", "a/motor/1"]
+    pseudos = graph.dependents("a/motor/0", recursive=True, cls="PseudoMotor")
+    assert pseudos and all(e.name.startswith("a/") for e in pseudos)
+    mgs = graph.dependents("b/channel/3", cls="MeasurementGroup")
+    assert [e.name for e in mgs] == ["b/mntgrp/0", "b/mntgrp/1"]
+    assert graph.dependencies("b/mntgrp/0")[0].name == "b/channel/0"
+    assert '"a/controller/pseudo_0" -> "a/pseudo/0";' in graph.to_dot()
+
+
+def test_load_graph(mock_db, smap):
+    graph = load_graph(["B108A"])
+    assert len(graph) == len(smap.elements)
+    snapshot = Snapshot.from_database(DatabaseContext())
+    assert len(load_graph(db=snapshot)) == len(graph)
+    mg = smap.measgrps[0]
+    channels = [e.alias for e in graph.references(mg)]
+    assert ";".join(channels) == smap.get_mg_channels(mg)
+
+
+def test_unknown_element():
+    graph = DependencyGraph.build([registry("a"), registry("b")])
+    with pytest.raises(KeyError):
+        graph.dependents("a/motor/999")
+    # Both pools use the same aliases
+    with pytest.raises(KeyError):
+        graph.dependents("motor_0")
+    single = DependencyGraph.build([registry("a")])
+    assert single.dependents("MOTOR_0") == single.dependents("a/motor/0")
+
+
+def test_main_unknown(mock_db, monkeypatch, capsys):
+    argv = ["sardana2xls-graph", "B108A", "--dependents", "nothing/here/1"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit):
+        graph_module.main()
+    assert "Unknown or ambiguous element: nothing/here/1" in (
+        capsys.readouterr().err
+    )
@@ -0,0 +1,83 @@
+import pytest
+from sardana2xls import sardana2xls
+from sardana2xls import utils
+from sardana2xls.journal import Journal
+from sardana2xls.writers import XlsWriter
+
+
+def test_journal(tmp_path):
+    path = str(tmp_path / "B108A.journal")
+    journal = Journal.open(path, {"pool": "B108A"})
+    rows = journal.record("motors", iter([("mot01", 1), ("mot02", 2)]))
+    assert next(rows) == ("mot01", 1)
+    # Unfinished when the export stops
+    resumed = Journal.open(path, {"pool": "B108A"}, resume=True)
+    assert "motors" not in resumed
+    assert list(resumed.record("doors", [[1, 0, "Door01"]]))
+    assert list(resumed.record("motors", [("mot01", 1)])) == [("mot01", 1)]
+    # Cut by a crash in the middle of a line
+    with open(path, "a") as fp:
+        fp.write('["pseu')
+    resumed = Journal.open(path, {"pool": "B108A"}, resume=True)
+    assert list(resumed.phases) == ["doors", "motors"]
+    assert resumed["motors"] == [["mot01", 1]]
+    other = Journal.open(path, {"pool": "B108B"}, resume=True)
+    assert not other.phases
+    other.close()
+    assert not (tmp_path / "B108A.journal").exists()
+
+
+def test_overwrite(tmp_path):
+    path = str(tmp_path / "B108A.journal")
+    Journal.open(path, {"pool": "B108A"}).close(done=False)
+    # An interrupted export is not lost by starting another one
+    with pytest.raises(FileExistsError):
+        Journal.open(path, {"pool": "B108A"})
+    with pytest.raises(RuntimeError):
+        with Journal.open(path, {"pool": "B108A"}, force=True) as journal:
+            raise RuntimeError()
+    assert journal._fp.closed
+    assert (tmp_path / "B108A.journal").exists()
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_failed_sheet(mock_db, tmp_path, monkeypatch, workers):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "B108A.journal")
+
+    def fail(self, name, db=None):
+        raise RuntimeError(name)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(sardana2xls.SardanaMap, "controller_data", fail)
+        with pytest.raises(RuntimeError):
+            sardana2xls.proceed("B108A", workers=workers)
+    # Sheets finished before the controllers are kept
+    key = {"pool": "B108A", "sheets": None, "classes": None}
+    journal = Journal.open(path, key, resume=True)
+    assert "motors" in journal and "pseudos" in journal
+    assert "controllers" not in journal
+    journal.close()
+
+
+def test_resume(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sardana2xls.proceed("B108A")
+    expected = (tmp_path / "B108A.xls").read_bytes()
+    assert not (tmp_path / "B108A.journal").exists()
+    (tmp_path / "B108A.xls").unlink()
+
+    def crash(self, path):
+        raise KeyboardInterrupt()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(XlsWriter, "save", crash)
+        with pytest.raises(KeyboardInterrupt):
+            sardana2xls.proceed("B108A", workers=2)
+    assert (tmp_path / "B108A.journal").exists()
+    db = utils.DatabaseContext()
+    sardana2xls.proceed("B108A", db=db, resume=True)
+    # Only the listing is loaded, every sheet comes from the journal
+    assert db.round_trips == 1
+    assert (tmp_path / "B108A.xls").read_bytes() == expected
+    assert not (tmp_path / "B108A.journal").exists()
@@ -0,0 +1,35 @@
+from sardana2xls import sardana2xls
+from sardana2xls.pipeline import sort_rows
+import random
+import types
+
+
+def test_sort_rows():
+    rows = [(random.randint(0, 20), n) for n in range(1000)]
+    key = lambda x: x[0]  # noqa: E731
+    assert list(sort_rows(iter(rows), key, buffer_size=64)) == sorted(
+        rows, key=key
+    )
+    assert list(sort_rows(rows, key)) == sorted(rows, key=key)
+    assert list(sort_rows([], key, buffer_size=1)) == []
+
+
+def test_lazy_rows(smap):
+    started = []
+
+    def iter_motors(names):
+        started.append(names)
+        yield from iter_rows(names)
+
+    iter_rows = smap.iter_motors
+    smap.iter_motors = iter_motors
+    rows = sardana2xls.collect_rows(smap)
+    assert isinstance(rows["motors"], types.GeneratorType)
+    # Rows are only built where they are consumed
+    assert not started
+    motors = list(rows["motors"])
+    assert started
+    assert len(motors) == len(smap.motors)
+    assert isinstance(smap.iter_motors(smap.motors), types.GeneratorType)
+    rows = sardana2xls.collect_rows(smap, workers=2)
+    assert rows["motors"] == motors
@@ -0,0 +1,129 @@
+import pytest
+from sardana2xls import sardana2xls
+from sardana2xls import utils
+from sardana2xls.policy import CallPolicy, AdaptiveLimit, CircuitOpen
+from sardana2xls.policy import is_transient
+from conftest import DatabaseMock
+
+
+class FlakyDatabase:
+    """ DatabaseMock timing out on every nth call """
+
+    def __init__(self, every):
+        self.db = DatabaseMock()
+        self.every = every
+        self.count = 0
+        self.faults = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+
+        def call(*args, **kwargs):
+            self.count += 1
+            if self.count % self.every == 0:
+                self.faults += 1
+                raise TimeoutError(name)
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class DevError:
+    def __init__(self, reason):
+        self.reason = reason
+
+
+class DevFailed(Exception):
+    pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.now += delay
+
+
+def test_is_transient():
+    assert is_transient(TimeoutError())
+    assert is_transient(DevFailed(DevError("API_DeviceTimedOut")))
+    assert not is_transient(DevFailed(DevError("API_DeviceNotDefined")))
+    assert not is_transient(KeyError("mot/01"))
+
+
+def test_retry():
+    clock = Clock()
+    policy = CallPolicy(retries=3, backoff=1, sleep=clock.sleep, clock=clock)
+    db = FlakyDatabase(every=2)
+    db.count = 1
+    assert policy.call(db.get_db_host) == "hello"
+    assert policy.retried == 1
+    assert clock.now == 1
+    # Backoff doubles, capped by max_backoff
+    assert [policy.delay(n) for n in range(6)] == [1, 2, 4, 8, 10, 10]
+
+
+def test_retries_exhausted():
+    clock = Clock()
+    policy = CallPolicy(retries=2, sleep=clock.sleep, clock=clock)
+    db = FlakyDatabase(every=1)
+    with pytest.raises(TimeoutError):
+        policy.call(db.get_db_host)
+    assert db.faults == 3
+
+
+def test_not_transient():
+    policy = CallPolicy(sleep=pytest.fail)
+    with pytest.raises(KeyError):
+        policy.call({}.__getitem__, "mot/01")
+    assert policy.failures == 0
+
+
+def test_circuit_breaker():
+    clock = Clock()
+    policy = CallPolicy(
+        retries=0, threshold=2, cooldown=10, sleep=clock.sleep, clock=clock
+    )
+    db = FlakyDatabase(every=1)
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            policy.call(db.get_db_host)
+    with pytest.raises(CircuitOpen):
+        policy.call(db.get_db_host)
+    assert db.faults == 2
+    # Half open after the cooldown, closed again by a success
+    clock.now += 10
+    db.every = 100
+    assert policy.call(db.get_db_host) == "hello"
+    assert policy.failures == 0
+
+
+def test_adaptive_limit():
+    limit = AdaptiveLimit(8)
+    limit.overload()
+    limit.overload()
+    assert limit.limit == 2
+    for _ in range(2 + 3):
+        limit.success()
+    assert limit.limit == 4
+    for _ in range(100):
+        limit.overload()
+    assert limit.limit == 1
+
+
+def test_flaky_export(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utils, "connect", DatabaseMock)
+    sardana2xls.proceed("B108A")
+    expected = (tmp_path / "B108A.xls").read_bytes()
+    flaky = FlakyDatabase(every=3)
+    monkeypatch.setattr(utils, "connect", lambda: flaky)
+    policy = CallPolicy(sleep=lambda delay: None)
+    sardana2xls.proceed("B108A", 4, utils.DatabaseContext(policy))
+    assert flaky.faults
+    assert policy.retried == flaky.faults
+    assert (tmp_path / "B108A.xls").read_bytes() == expected
@@ -0,0 +1,39 @@
+import pytest
+from sardana2xls import profiling
+from sardana2xls import sardana2xls
+import json
+
+
+def test_reply_size():
+    assert profiling.reply_size(([1, 2], ["ab", "cde"])) == 21
+    assert profiling.reply_size({"id": ["12"]}) == 4
+
+
+def test_disabled():
+    profiling.disable()
+    with profiling.phase("motors"):
+        assert profiling.record("abc") == "abc"
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_profile(mock_db, tmp_path, monkeypatch, workers):
+    monkeypatch.chdir(tmp_path)
+    profiler = profiling.enable()
+    try:
+        sardana2xls.proceed("B108A", workers=workers)
+    finally:
+        profiling.disable()
+    phases = profiler.phases
+    for name in ["listing", "properties", "elements", "motors", "save"]:
+        assert name in phases
+    # Each bulk loader is one DbMySqlSelect
+    assert phases["listing"]["calls"] == 1
+    assert phases["properties"]["calls"] == 1
+    assert phases["properties"]["bytes"] > 0
+    assert phases["elements"]["calls"] == 0
+    # Controllers are read from the bulk loaded properties
+    assert phases["controllers"]["calls"] == 0
+    # Rows are built in the phase of their sheet, sequential or not
+    assert "other" not in phases
+    assert json.loads(profiler.json()) == phases
+    assert profiler.table().splitlines()[0].split()[0] == "phase"
@@ -1,111 +1,14 @@
 import pytest
-import os
-import json
 from sardana2xls import sardana2xls
+from sardana2xls.delta import read_workbook
 from mock import MagicMock
 
 
-class DatabaseMock:
-    def __init__(self):
-        test_path = os.path.dirname(os.path.realpath(__file__))
-        with open("{}/tangodb.json".format(test_path), "r") as fp:
-            self.data = json.load(fp)
-
-    def get_device_name(self, server, cls):
-        server, instance = server.split("/")
-        if cls == "*":
-            devices = []
-            for cls in self.data["servers"][server][instance].values():
-                devices += cls.keys()
-            return devices
-        return list(self.data["servers"][server][instance][cls].keys())
-
-    def get_device_property(self, name, prop):
-        for _, instance in self.data["servers"].items():
-            for _, classes in instance.items():
-                for _, devices in classes.items():
-                    for device, props in devices.items():
-                        if name.lower() == device.lower():
-                            if prop == "Angleconversion":
-                                print(prop)
-                            return {
-                                prop: props["properties"].get(prop.lower(), [])
-                            }
-
-    def get_device_property_list(self, name, props):
-        for _, instance in self.data["servers"].items():
-            for _, classes in instance.items():
-                for _, devices in classes.items():
-                    for device, props in devices.items():
-                        if name.lower() == device.lower():
-                            return props["properties"].keys()
-
-    def get_alias(self, name):
-        for a, instance in self.data["servers"].items():
-            for _, classes in instance.items():
-                for _, devices in classes.items():
-                    for device, props in devices.items():
-                        if name.lower() == device.lower():
-                            return props.get("alias", "")
-
-    # TODO: Fix it
-    get_alias_from_device = get_alias
-
-    def get_class_for_device(self, name):
-        for a, instance in self.data["servers"].items():
-            for _, classes in instance.items():
-                for cls, devices in classes.items():
-                    for device in devices.keys():
-                        if name.lower() == device.lower():
-                            return cls
-
-    def get_db_host(self):
-        return "hello"
-
-    def get_db_port(self):
-        return 1234
-
-    def _get_attribute_props(self, name):
-        ret = []
-        for a, instance in self.data["servers"].items():
-            for _, classes in instance.items():
-                for cls, devices in classes.items():
-                    for device, props in devices.items():
-                        if name.lower() == device.lower():
-                            attr = props.get("attribute_properties", {})
-                            for name, value in attr.items():
-                                try:
-                                    ret.append(
-                                        "{}:{}".format(
-                                            name, value["__value"][0]
-                                        )
-                                    )
-                                # TODO: Fix position min_value  ...
-                                except KeyError:
-                                    pass
-                            return ret
-        return ret
-
-
-@pytest.fixture
-def mock_db():
-    sardana2xls.tango.Database = DatabaseMock
-    database = DatabaseMock()
-    sardana2xls.get_motor_attributes = lambda x: database._get_attribute_props(
-        x
-    )
-
-
 @pytest.fixture
 def sheet():
     return MagicMock()
 
 
-@pytest.fixture
-def smap(mock_db):
-    return sardana2xls.SardanaMap("B108A")
-
-
 def test_iors(smap, sheet):
     smap.proceed_iors(smap.iors, sheet)
 
@@ -149,3 +52,117 @@ def test_instruments(smap, sheet):
 
 def test_doors(smap, sheet):
     smap.proceed_doors(smap.doors, sheet)
+
+
+def test_database_context(smap, sheet):
+    assert smap.db.connections == 1
+    trips = smap.db.round_trips
+    smap.proceed_motors(smap.motors, sheet)
+    # Motor data is read from the bulk loaded properties
+    assert smap.db.round_trips == trips
+    smap.proceed_controllers(smap.controllers, sheet)
+    assert smap.db.round_trips == trips
+    assert smap.db.connections == 1
+
+
+def test_controller_batch(smap, sheet):
+    smap.db.calls.clear()
+    smap.proceed_controllers(smap.controllers, sheet)
+    # Read from the properties loaded with the elements
+    assert smap.db.calls["command_inout"] == 0
+    assert smap.db.round_trips == 0
+    ctrl = smap.controllers[0]
+    assert smap.controller_data(ctrl) == smap.controller_data(
+        ctrl, smap.properties
+    )
+    smap.db.calls.clear()
+    props = sardana2xls.get_properties(ctrl, smap.db)
+    assert smap.db.calls["get_device_property"] == 1
+    assert props == [
+        "{}:{}".format(p, sardana2xls.get_property(ctrl, p, smap.db))
+        for p in sardana2xls.get_property_list(ctrl, smap.db)
+    ]
+
+
+def test_attributes(smap):
+    motor = smap.motors[0]
+    attributes = smap.get_attributes(motor)
+    assert attributes
+    assert smap.get_attributes(motor.upper()) == attributes
+    assert not [a for a in attributes if a.startswith("DialPosition:")]
+    assert not [a for a in attributes if a.startswith("PowerOn:")]
+
+
+def test_workers(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sardana2xls.proceed("B108A")
+    sequential = (tmp_path / "B108A.xls").read_bytes()
+    sardana2xls.proceed("B108A", workers=4)
+    assert (tmp_path / "B108A.xls").read_bytes() == sequential
+
+
+def test_listing(smap):
+    assert smap.db.calls["get_class_for_device"] == 0
+    assert smap.db.calls["get_device_name"] == 0
+    assert "B108A/DOOR/01" in smap.doors
+    assert smap.listing.get_server_list("pool/*") == ["Pool/B108A"]
+
+
+def test_proceed_many(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert sardana2xls.proceed_many() == []
+    assert (tmp_path / "B108A.xls").exists()
+    assert sardana2xls.proceed_many(["B108A", "Unknown"], jobs=2) == [
+        "Unknown"
+    ]
+
+
+def test_sheets(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sardana2xls.proceed("B108A")
+    full = read_workbook(str(tmp_path / "B108A.xls"))
+    smap = sardana2xls.SardanaMap("B108A", sheets=["controllers"])
+    # No memorized attribute is exported by the controllers sheet
+    assert not [q for q in smap.db.db.queries if "attribute" in q]
+    assert len(smap.elements) < len(sardana2xls.SardanaMap("B108A").elements)
+    sardana2xls.proceed("B108A", sheets=["controllers", "measgrps"])
+    partial = read_workbook(str(tmp_path / "B108A.xls"))
+    assert partial["controllers"] == full["controllers"]
+    assert partial["measgrps"] == full["measgrps"]
+    assert partial["motors"] == []
+
+
+def test_classes(mock_db):
+    smap = sardana2xls.SardanaMap("B108A", classes=["CTExpChannel"])
+    assert smap.channels
+    assert {cls for _, cls in smap.channels} == {"CTExpChannel"}
+    assert smap.motors == []
+    assert smap.class_filter == ["ctexpchannel"]
+    # Only the attributes of the exported channels are fetched
+    assert set(smap.attributes) <= {c.lower() for c, _ in smap.channels}
+    # The class mappings still hold every element
+    assert "Motor" in smap.classes.values()
+    # References to the other classes are still resolved
+    assert all(smap.get_controller_alias(c) for c, _ in smap.channels)
+
+
+def test_lazy(mock_db):
+    smap = sardana2xls.SardanaMap("B108A", lazy=True)
+    assert len(smap.db.db.queries) == 1
+    assert "properties" not in vars(smap)
+    eager = sardana2xls.SardanaMap("B108A")
+    motor = eager.motors[0]
+    assert smap.motor_data(motor, "Motor") == eager.motor_data(motor, "Motor")
+    # Properties and attributes are each loaded once, in bulk
+    assert len(smap.db.db.queries) == 3
+    smap.motor_data(eager.motors[1], "Motor")
+    assert len(smap.db.db.queries) == 3
+    # Mappings of the previous releases
+    alias = smap.registry[motor].alias
+    assert smap.aliases[alias] == motor
+    assert smap.aliases[alias.upper()] == motor
+    assert smap.ids[smap.registry[motor].id] == motor
+    assert smap.ctrl_ids[motor] == [smap.registry[motor].ctrl_id]
+    assert smap.classes[motor] == "Motor"
+    assert smap.classes_ms[smap.doors[0]] == "Door"
+    assert smap.channel_ids[eager.measgrps[0]]
@@ -0,0 +1,24 @@
+from sardana2xls import sardana2xls
+from sardana2xls.snapshot import Snapshot
+from sardana2xls.utils import DatabaseContext
+
+
+def test_snapshot(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sardana2xls.proceed("B108A")
+    live = (tmp_path / "B108A.xls").read_bytes()
+    db = DatabaseContext()
+    Snapshot.from_database(db, ["B108A"]).save(str(tmp_path / "dump.json"))
+    snapshot = Snapshot.load(str(tmp_path / "dump.json"))
+    assert snapshot.get_class_for_device("B108A/DOOR/01") == "Door"
+    assert snapshot.get_alias("b108a/door/01") == "Door_B108A"
+    sardana2xls.proceed("B108A", db=snapshot)
+    assert (tmp_path / "B108A.xls").read_bytes() == live
+
+
+def test_snapshot_all_pools(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    snapshot = Snapshot.from_database(DatabaseContext())
+    assert snapshot.listing.get_server_list("Pool/*") == ["Pool/B108A"]
+    assert sardana2xls.proceed_many(db=snapshot) == []
+    assert (tmp_path / "B108A.xls").exists()
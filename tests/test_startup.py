@@ -0,0 +1,34 @@
+import subprocess
+import sys
+import json
+
+# Seconds allowed to import the command line module, measured at ~45 ms.
+# Loading PyTango alone (numpy included) takes ~150 ms.
+STARTUP_BUDGET = 0.15
+
+# Modules only loaded once the db is queried or a workbook written
+LAZY_MODULES = ["tango", "numpy", "xlrd", "xlwt", "xlutils", "asyncio"]
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import sardana2xls.sardana2xls
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, sorted(sys.modules)]))
+"""
+
+
+def import_module():
+    output = subprocess.check_output([sys.executable, "-c", SCRIPT])
+    return json.loads(output)
+
+
+def test_lazy_imports():
+    _, modules = import_module()
+    assert not [name for name in LAZY_MODULES if name in modules]
+
+
+def test_startup_budget():
+    # Best of a few runs, the first one may read cold files
+    elapsed = min(import_module()[0] for _ in range(3))
+    assert elapsed < STARTUP_BUDGET
@@ -33,3 +33,89 @@ def test_unique_bidict():
     assert "Test" not in dic
     assert dic["Test2"] == 1
     assert dic[1] == "Test2"
+
+
+def test_unique_bidict_from_pairs():
+    pairs = [("a", 1), ("b", 2), ("a", 3), ("c", 2)]
+    dic = utils.unique_bidict()
+    for key, value in pairs:
+        dic[key] = value
+    bulk = utils.unique_bidict.from_pairs(pairs)
+    assert bulk.forward == dic.forward == {"a": 3, "c": 2}
+    assert bulk.inverse == {3: "a", 2: "c"}
+    bulk = utils.unique_bidict.from_pairs([("a", 1), ("b", 2)])
+    assert bulk["b"] == 2
+    assert bulk[2] == "b"
+    bulk["d"] = 2
+    assert bulk[2] == "d"
+    with pytest.raises(TypeError):
+        bulk.forward["e"] = 5
+
+
+def test_unique_bidict_casefold():
+    dic = utils.unique_bidict.from_pairs([("Mot01", "pool/Motor/01")])
+    assert "mot01" not in dic
+    dic = utils.unique_bidict.from_pairs(
+        [("Mot01", "pool/Motor/01")], casefold=True
+    )
+    assert dic["mot01"] == "pool/Motor/01"
+    assert dic["POOL/MOTOR/01"] == "Mot01"
+    assert dic["Mot01"] == "pool/Motor/01"
+    with pytest.raises(KeyError):
+        dic["mot02"]
+    assert list(dic) == ["Mot01"]
+
+
+class SelectMock:
+    def __init__(self, reply):
+        self.reply = reply
+        self.queries = []
+
+    def command_inout(self, cmd, query):
+        self.queries.append(query)
+        return [], list(self.reply)
+
+
+def test_get_device_properties():
+    reply = ["Mot/01", "Axis", "1"]
+    reply += ["mot/01", "offsets", "1", "mot/01", "offsets", "2"]
+    db = SelectMock(reply)
+    props = utils.get_device_properties(["mot/01", "mot/02"], db)
+    assert len(db.queries) == 1
+    assert "'mot/01','mot/02'" in db.queries[0]
+    assert props.get_device_property("MOT/01", "axis") == {"axis": ["1"]}
+    assert props.get_device_property("mot/01", "Offsets") == {
+        "Offsets": ["1", "2"]
+    }
+    assert props.get_device_property("mot/02", "axis") == {"axis": []}
+    assert sorted(props.get_device_property_list("mot/01")) == [
+        "Axis",
+        "offsets",
+    ]
+
+
+def test_get_device_properties_chunks():
+    db = SelectMock([])
+    devices = ["mot/{}".format(n) for n in range(5)]
+    utils.get_device_properties(devices, db, chunk_size=2)
+    assert len(db.queries) == 3
+    assert "'mot/4'" in db.queries[2]
+
+
+def test_quote():
+    assert utils.quote("it's") == "'it\\'s'"
+
+
+def test_select_rows():
+    rows = list(utils.PROPERTIES.rows(["mot/01", "axis", "1", "mot/02"]))
+    assert rows == [("mot/01", "axis", "1")]
+    assert rows[0].value == "1"
+
+
+def test_select_chunks():
+    db = SelectMock(["mot/0", "2020-01-01", "it's/1", "2020-01-02"])
+    devices = ["mot/0", "it's/1", "mot/2"]
+    rows = list(utils.HISTORY.select(db, devices, 2, table="history"))
+    assert len(db.queries) == 2
+    assert "from history where device in ('mot/0','it\\'s/1')" in db.queries[0]
+    assert [row.date for row in rows] == ["2020-01-01", "2020-01-02"] * 2
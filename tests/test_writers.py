@@ -0,0 +1,68 @@
+from sardana2xls import sardana2xls
+from sardana2xls import writers
+import openpyxl
+import pytest
+import xlrd
+
+
+def strip_row(row):
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def test_streaming_sheet():
+    rows = []
+    sheet = writers.StreamingSheet(
+        type("Sheet", (), {"append": lambda self, row: rows.append(row)})(),
+        [["Type", "Name"], ["template"]],
+    )
+    sheet.write(0, 1, "name")
+    sheet.write(2, 0, "a")
+    sheet.write(2, 2, "c")
+    with pytest.raises(ValueError):
+        sheet.write(1, 0, "late")
+    sheet.close()
+    assert rows == [["Type", "name"], ["template"], ["a", None, "c"]]
+
+
+def test_xlsx(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sardana2xls.proceed("B108A")
+    sardana2xls.proceed("B108A", fmt="xlsx")
+    xls = xlrd.open_workbook(str(tmp_path / "B108A.xls"))
+    xlsx = openpyxl.load_workbook(str(tmp_path / "B108A.xlsx"))
+    assert xls.sheet_names() == xlsx.sheetnames
+    for sheet in xls.sheets():
+        expected = [sheet.row_values(n) for n in range(sheet.nrows)]
+        rows = [
+            ["" if v is None else v for v in row]
+            for row in xlsx[sheet.name].iter_rows(values_only=True)
+        ]
+        assert [strip_row(r) for r in rows] == [strip_row(r) for r in expected]
+
+
+def test_write_rows(tmp_path):
+    rows = [("Motor", "", "ctrl", 1), ("Motor", "pool", "", "")]
+    paths = []
+    for bulk in (False, True):
+        writer = writers.XlsWriter("template/template.xls")
+        if bulk:
+            writer.write_rows(writer.motor_sheet, rows)
+        else:
+            sardana2xls.write_rows(writer.motor_sheet, rows)
+        paths.append(tmp_path / "{}.xls".format(bulk))
+        writer.save(str(paths[-1]))
+    assert paths[0].read_bytes() == paths[1].read_bytes()
+
+
+def test_streaming_write_row():
+    rows = []
+    sheet = writers.StreamingSheet(
+        type("Sheet", (), {"append": lambda self, row: rows.append(row)})(),
+        [["Type", "Name", "Axis"]],
+    )
+    sheet.write_row(1, ["Motor", "mot01"])
+    sheet.close()
+    assert rows == [["Type", "Name", "Axis"], ["Motor", "mot01"]]
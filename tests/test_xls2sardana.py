@@ -0,0 +1,98 @@
+from sardana2xls import sardana2xls, xls2sardana
+from sardana2xls.delta import read_workbook
+from sardana2xls.snapshot import Snapshot
+from sardana2xls.utils import DatabaseContext
+from sardana2xls import utils
+from conftest import DatabaseMock
+import types
+import json
+import sys
+
+
+def test_parse_pairs():
+    assert xls2sardana.parse_pairs("") == []
+    assert xls2sardana.parse_pairs("Offset:1;Sign:-1") == [
+        ("Offset", "1"),
+        ("Sign", "-1"),
+    ]
+    assert xls2sardana.cell(1.0) == "1"
+    assert xls2sardana.cell(1.5) == "1.5"
+
+
+def modify(snapshot):
+    """ Change a motor and a controller, return their names """
+    smap = sardana2xls.SardanaMap("B108A", snapshot)
+    motor = [m for m in smap.motors if smap.get_attributes(m)][0]
+    ctrl = smap.controllers[0]
+    attr = smap.get_attributes(motor)[0].split(":")[0]
+    snapshot.put_device_alias(motor, "renamed")
+    snapshot.put_device_property(motor, {"axis": "42"})
+    snapshot.put_device_attribute_property(motor, {attr: {"__value": ["7"]}})
+    snapshot.put_device_property(ctrl, {"library": "Other.py"})
+    return motor, ctrl, attr
+
+
+def test_round_trip(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "B108A.xls")
+    snapshot = Snapshot.from_database(DatabaseContext(), ["B108A"])
+    sardana2xls.proceed("B108A", db=snapshot)
+    exported = (tmp_path / "B108A.xls").read_bytes()
+    pool, rows = xls2sardana.read_pool(path), read_workbook(path)
+    assert pool == "B108A"
+    assert xls2sardana.plan_changes(rows, snapshot, pool) == {}
+    # Restore a db modified since the export
+    motor, ctrl, attr = modify(snapshot)
+    changes = xls2sardana.plan_changes(rows, snapshot, pool)
+    assert sorted(changes) == sorted([motor, ctrl])
+    assert changes[motor]["alias"][0] == "renamed"
+    assert changes[motor]["properties"]["axis"][0] == ["42"]
+    assert changes[motor]["attributes"][attr][0] == "7"
+    assert list(changes[ctrl]["properties"]) == ["library"]
+    xls2sardana.apply_changes(changes, snapshot)
+    assert xls2sardana.plan_changes(rows, snapshot, pool) == {}
+    sardana2xls.proceed("B108A", db=snapshot)
+    assert (tmp_path / "B108A.xls").read_bytes() == exported
+
+
+def device_info(name, cls, server):
+    return types.SimpleNamespace(name=name, _class=cls, server=server)
+
+
+def test_add_devices(mock_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "B108A.xls")
+    sardana2xls.proceed("B108A")
+    rows, servers = read_workbook(path), xls2sardana.read_servers(path)
+    empty = DatabaseMock()
+    empty.data = {"servers": {}}
+    monkeypatch.setattr(utils, "connect", lambda: empty)
+    monkeypatch.setattr(utils, "device_info", device_info)
+    db = DatabaseContext()
+    changes = xls2sardana.plan_changes(rows, db, "B108A", servers)
+    pool, motor = servers[0][5], rows["motors"][0]
+    assert changes[pool]["add"] == ["Pool/B108A", "Pool"]
+    assert changes[motor[4]]["add"] == ["Pool/B108A", "Motor"]
+    assert changes[motor[4]]["alias"] == ["", motor[3]]
+    # Added before their settings are written
+    xls2sardana.apply_changes(changes, db)
+    assert db.calls["add_device"] == len(changes)
+    assert db.get_alias(motor[4]) == motor[3]
+    assert xls2sardana.plan_changes(rows, db, "B108A", servers) == {}
+
+
+def test_main(mock_db, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    dump = str(tmp_path / "dump.json")
+    snapshot = Snapshot.from_database(DatabaseContext(), ["B108A"])
+    sardana2xls.proceed("B108A", db=snapshot)
+    motor, _, _ = modify(snapshot)
+    snapshot.save(dump)
+    argv = ["xls2sardana", "B108A.xls", "--snapshot", dump]
+    monkeypatch.setattr(sys, "argv", argv + ["--dry-run"])
+    xls2sardana.main()
+    assert motor in json.loads(capsys.readouterr().out)
+    assert Snapshot.load(dump).get_alias(motor) == "renamed"
+    monkeypatch.setattr(sys, "argv", argv)
+    xls2sardana.main()
+    assert Snapshot.load(dump).get_alias(motor) != "renamed"